@@ -1,14 +1,69 @@
-import autogen
-from config import OLLAMA_VL_CONFIG
+from config import OLLAMA_VL_CONFIG, llm_config_for
 from tools import web_search
+from cache import cache_for, agent_cache_key
+from singleflight import flight_for
+from intent import INTENT_EXAMPLES
+from requirements_state import AREA_LABELS
+from metrics import record_call
+from llm import complete
+import hashlib
+import json
 import logging
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 llm_config = OLLAMA_VL_CONFIG
 
-def create_orchestrator_agent():
+# autogen (with openai, pydantic and flaml behind it) takes ~1s to import, so
+# it is only imported by the functions that build agents
+
+def _with_reply_hooks(agent):
+    """Route every generate_reply through llm.complete with metrics.
+    
+    Repeats are served from the cache and identical concurrent calls are
+    joined (single-flight) for agents that opted in.
+    """
+    cache = cache_for(agent.name)
+    
+    def instrumented_reply(recipient, messages=None, sender=None, config=None):
+        started = time.perf_counter()
+        prompt = [{"content": recipient.system_message}] + list(messages or [])
+        flight = flight_for(recipient.name)
+        key = agent_cache_key(recipient, messages) if (cache or flight) else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                logging.info(f"{recipient.name} reply served from cache")
+                record_call(recipient.name, "reply", started, prompt, cached, outcome="cache_hit")
+                return True, cached
+        
+        try:
+            # Routed across the role's endpoints instead of AutoGen's in-order config_list fallback
+            if flight:
+                reply, shared = flight.do(key, lambda: complete(recipient, messages or []))
+            else:
+                reply, shared = complete(recipient, messages or []), False
+        except Exception:
+            record_call(recipient.name, "reply", started, prompt, outcome="error")
+            raise
+        if shared:
+            logging.info(f"{recipient.name} reply shared with an identical call in flight")
+        record_call(recipient.name, "reply", started, prompt, reply, outcome="coalesced" if shared else "ok")
+        if cache and not shared:
+            cache.set(key, reply)
+        return True, reply
+    
+    import autogen
+
+    agent.register_reply([autogen.Agent, None], instrumented_reply, position=0)
+    return agent
+
+def create_orchestrator_agent(config: dict = None):
     """Orchestrator that manages the entire workflow"""
-    return autogen.AssistantAgent(
+    import autogen
+
+    return _with_reply_hooks(autogen.AssistantAgent(
         name="orchestrator",
         system_message="""You are the Orchestrator Agent. Your responsibilities:
 
@@ -25,15 +80,21 @@ When you receive user input:
 - Coordinate with research_agent and prd_agent for final document
 
 Always be the central coordinator. Make decisions about workflow progression.""",
-        llm_config=llm_config,
+        llm_config=config or llm_config,
         human_input_mode="NEVER"
-    )
+    ))
+
+def _intent_examples() -> str:
+    """Render the shared intent examples for the classifier prompt"""
+    return "\n".join(f'- "{text}" → "{label}"' for text, label in INTENT_EXAMPLES)
 
-def create_intent_classifier():
+def create_intent_classifier(config: dict = None):
     """Intent classification as a tool for orchestrator"""
-    return autogen.AssistantAgent(
+    import autogen
+
+    return _with_reply_hooks(autogen.AssistantAgent(
         name="intent_classifier",
-        system_message="""You are an Intent Classification specialist. 
+        system_message=f"""You are an Intent Classification specialist. 
 
 TASK: Analyze user input and classify their intent.
 
@@ -42,22 +103,20 @@ CLASSIFICATION RULES:
 - Return "other" for general questions, greetings, or unclear requests
 
 EXAMPLES:
-- "I want to build a mobile app" → "prd"
-- "UPI integration into payments bank" → "prd" 
-- "Create user stories for authentication" → "prd"
-- "Hello, how are you?" → "other"
-- "What can you do?" → "other"
+{_intent_examples()}
 
 RESPONSE FORMAT: Return ONLY the classification word: "prd" or "other"
 
 Do not provide explanations. Just the classification.""",
-        llm_config=llm_config,
+        llm_config=config or llm_config,
         human_input_mode="NEVER"
-    )
+    ))
 
-def create_conversation_agent():
+def create_conversation_agent(config: dict = None):
     """Conversation agent that gathers requirements systematically"""
-    return autogen.AssistantAgent(
+    import autogen
+
+    return _with_reply_hooks(autogen.AssistantAgent(
         name="conversation_agent",
         system_message="""You are a Product Requirements Specialist. Your job is to gather comprehensive product requirements through systematic questioning.
 
@@ -72,7 +131,7 @@ CORE REQUIREMENTS TO GATHER:
 8. Business Context & Goals
 
 CONVERSATION RULES:
-- Ask ONLY ONE specific, focused question per response
+- Ask ONE specific, focused question per response, unless told to ask about several areas together
 - Build on previous answers to go deeper
 - Be conversational but professional
 - Probe for details when answers are vague
@@ -93,13 +152,37 @@ QUESTION EXAMPLES:
 - "What would success look like for this product?"
 
 Stay focused on gathering actionable, specific requirements.""",
-        llm_config=llm_config,
+        llm_config=config or llm_config,
+        human_input_mode="NEVER"
+    ))
+
+def create_requirements_extractor(config: dict = None):
+    """Requirements extractor for one-shot PRDs: all eight areas from a single idea, no questions"""
+    import autogen
+
+    areas = "\n".join(f"{number}. {label}" for number, label in enumerate(AREA_LABELS.values(), 1))
+    return _with_reply_hooks(autogen.AssistantAgent(
+        name="requirements_extractor",
+        system_message=f"""You are a Requirements Analyst. You get a single product idea and no chance to ask questions.
+
+TASK: Extract the product requirements for each of these areas:
+{areas}
+
+RULES:
+- Use what the idea states; where it says nothing, infer a sensible default and start the details with "Assumed:"
+- Be specific and brief: one or two sentences per area
+
+RESPONSE FORMAT: Exactly one line per area, in the order above:
+<area name>: <details>""",
+        llm_config=config or llm_config,
         human_input_mode="NEVER"
-    )
+    ))
 
-def create_research_agent():
+def create_research_agent(config: dict = None):
     """Research agent that performs market and technical research"""
-    return autogen.AssistantAgent(
+    import autogen
+
+    return _with_reply_hooks(autogen.AssistantAgent(
         name="research_agent",
         system_message="""You are a Market & Technical Research Specialist.
 
@@ -127,13 +210,15 @@ Structure your research in clear sections:
 ## Recommendations
 
 Focus on actionable insights that will inform the PRD. Use your knowledge of industry standards and common practices.""",
-        llm_config=llm_config,
+        llm_config=config or llm_config,
         human_input_mode="NEVER"
-    )
+    ))
 
-def create_prd_agent():
+def create_prd_agent(config: dict = None):
     """PRD generation agent that creates comprehensive documents"""
-    return autogen.AssistantAgent(
+    import autogen
+
+    return _with_reply_hooks(autogen.AssistantAgent(
         name="prd_agent", 
         system_message="""You are a Senior Product Manager specializing in creating comprehensive Product Requirements Documents.
 
@@ -199,6 +284,50 @@ QUALITY STANDARDS:
 - Ensure requirements are testable
 - Use clear, professional language
 - Include relevant technical details""",
-        llm_config=llm_config,
+        llm_config=config or llm_config,
         human_input_mode="NEVER"
-    )
\ No newline at end of file
+    ))
+
+AGENT_FACTORIES = {
+    'orchestrator': create_orchestrator_agent,
+    'intent_classifier': create_intent_classifier,
+    'conversation_agent': create_conversation_agent,
+    'requirements_extractor': create_requirements_extractor,
+    'research_agent': create_research_agent,
+    'prd_agent': create_prd_agent
+}
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _config_key(config: dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def get_agent(role: str, config: dict = None):
+    """Process-wide shared agent for a role and config (default: the role's route), built on first use.
+    
+    Agents are only used through generate_reply with explicit messages, so
+    they hold no per-session state and can be shared by every workflow.
+    """
+    config = config or llm_config_for(role)
+    key = (role, _config_key(config))
+    agent = _registry.get(key)
+    if agent is None:
+        with _registry_lock:
+            agent = _registry.get(key)
+            if agent is None:
+                agent = AGENT_FACTORIES[role](config)
+                _registry[key] = agent
+                logging.info(f"Agent '{role}' created")
+    return agent
+
+class SharedAgents:
+    """Dict-style view of the shared registry; agents are built when first looked up"""
+    
+    def __getitem__(self, role: str):
+        return get_agent(role)
+    
+    def __contains__(self, role: str) -> bool:
+        return role in AGENT_FACTORIES
+
+shared_agents = SharedAgents()
@@ -0,0 +1,105 @@
+from workflow import PRDWorkflow, ModelCall, Parallel, Wait
+from llm import astream_reply, areply
+from metrics import registry
+from research import gather_research
+from typing import AsyncIterator
+import asyncio
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+class AsyncPRDWorkflow(PRDWorkflow):
+    """PRDWorkflow driven on asyncio.
+
+    Runs the same workflow logic as PRDWorkflow, but model calls go through
+    the shared async connection pool in llm.py, so many sessions can share one
+    event loop and one model endpoint, queued fairly per session.
+    """
+
+    async def process_input(self, user_input: str) -> dict:
+        """Process user input through the agent workflow"""
+
+        result = {}
+        async for event in self._aevents(user_input, stream=False):
+            if event["event"] == "result":
+                result = event["result"]
+        return result
+
+    def stream_input(self, user_input: str) -> AsyncIterator[dict]:
+        """Async version of PRDWorkflow.stream_input; yields the same events"""
+        return self._aevents(user_input, stream=True)
+
+    async def generate(self, idea: str) -> dict:
+        """Async generate_prd on this workflow: one-shot PRD, same structured result"""
+
+        started = time.perf_counter()
+        result = {}
+        async for event in self._aevents(idea, stream=False, one_shot=True):
+            if event["event"] == "result":
+                result = event["result"]
+        return self._one_shot_result(result, time.perf_counter() - started)
+
+    async def _aevents(self, user_input: str, stream: bool, one_shot: bool = False) -> AsyncIterator[dict]:
+        """Run one workflow turn, awaiting model calls instead of blocking"""
+
+        turn = self._turn(user_input, stream, one_shot)
+        send, error = None, None
+        self._time_stage(self.stage)
+        while True:
+            try:
+                item = turn.throw(error) if error else turn.send(send)
+            except StopIteration:
+                self._time_stage(None)
+                return
+            send, error = None, None
+
+            try:
+                if isinstance(item, ModelCall):
+                    agent = self.agents[item.agent]
+                    if item.stream:
+                        chunks = []
+                        async for token in astream_reply(agent, item.messages, self.session_id):
+                            chunks.append(token)
+                            yield {"event": "token", "agent": item.agent, "content": token}
+                        send = "".join(chunks)
+                    else:
+                        send = await areply(agent, item.messages, self.session_id)
+                elif isinstance(item, Parallel):
+                    send = list(await asyncio.gather(*(
+                        areply(self.agents[call.agent], call.messages, self.session_id)
+                        for call in item.calls
+                    )))
+                elif isinstance(item, Wait):
+                    send = await item.handle
+                else:
+                    if item["event"] == "stage":
+                        self._time_stage(item["stage"])
+                    yield item
+            except Exception as e:
+                error = e
+
+    def _start_research(self, topic: str):
+        """Start market research as an asyncio task on the running loop"""
+        return asyncio.ensure_future(self._aresearch(topic))
+
+    async def _aresearch(self, topic: str) -> str:
+        """Web search (on a worker thread) followed by the research agent"""
+        findings = await asyncio.to_thread(gather_research, topic)
+        return await areply(self.agents['research_agent'], [
+            {"role": "user", "content": self._research_prompt(topic, findings)}
+        ], self.session_id)
+
+    def _start_speculative_prd(self, requirements: str):
+        """Draft the PRD speculatively as an asyncio task"""
+        return asyncio.ensure_future(self._aspeculative_prd(requirements, self._research_future))
+
+    async def _aspeculative_prd(self, requirements: str, research_future) -> str:
+        started = time.perf_counter()
+        # Shielded: cancelling a discarded draft must not cancel the research it shares
+        research = await asyncio.shield(research_future) if research_future is not None else ""
+        prd = await areply(self.agents['prd_agent'], [
+            {"role": "user", "content": self._prd_prompt(requirements, research)}
+        ], f"{self.session_id}:speculation")
+        registry.observe("prd_speculation_seconds", time.perf_counter() - started, task="prd")
+        return prd
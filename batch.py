@@ -0,0 +1,163 @@
+from workflow import generate_prd
+import csv
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+def read_ideas(path: str) -> list:
+    """Read ideas from a .jsonl or .csv file, or '-' for stdin (one idea or JSON object per line).
+
+    Each idea becomes {"id": ..., "idea": ...}; ids default to the line/row number.
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+        return _parse_lines(lines)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            columns = reader.fieldnames or []
+            # Without an idea column, the first column holds the ideas
+            column = "idea" if "idea" in columns else next(iter(columns), None)
+            ideas = []
+            for index, row in enumerate(reader, 1):
+                text = (row.get(column) or "").strip()
+                if not text:
+                    logging.warning(f"Skipping row {index}: no idea")
+                    continue
+                ideas.append({"id": str(row.get("id") or index), "idea": text})
+            return ideas
+        return _parse_lines(f.read().splitlines())
+
+def _parse_lines(lines: list) -> list:
+    """Parse JSONL records or plain-text ideas, skipping blank lines and records without an idea"""
+    ideas = []
+    for index, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.warning(f"Skipping line {index}: invalid JSON ({e})")
+                continue
+            idea = record.get("idea") if isinstance(record, dict) else None
+            if not isinstance(idea, str) or not idea.strip():
+                logging.warning(f"Skipping line {index}: record has no \"idea\"")
+                continue
+            ideas.append({"id": str(record.get("id", index)), "idea": idea.strip()})
+        else:
+            ideas.append({"id": str(index), "idea": line})
+    return ideas
+
+def _safe_name(item_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", item_id)[:100] or "item"
+
+class BatchWriter:
+    """Appends results as they finish; doubles as the resume checkpoint.
+
+    output ending in .jsonl writes one record per line to that file. Any other
+    output is a directory holding <id>.md per PRD plus results.jsonl.
+    """
+
+    def __init__(self, output: str):
+        if output.lower().endswith(".jsonl"):
+            self.directory = None
+            self.log_path = output
+        else:
+            self.directory = output
+            self.log_path = os.path.join(output, "results.jsonl")
+            os.makedirs(output, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def completed_ids(self) -> set:
+        """Ids already finished successfully in a previous run"""
+        done = set()
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partial line from an interrupted run
+                    if record.get("status") == "ok":
+                        done.add(record["id"])
+        return done
+
+    def write(self, record: dict):
+        with self._lock:
+            if self.directory and record.get("prd"):
+                path = os.path.join(self.directory, f"{_safe_name(record['id'])}.md")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(record["prd"])
+                record = dict(record, prd_path=path)
+                record.pop("prd")
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+def run_batch(ideas: list, output: str, workers: int = 4, timeout: float = 900,
+              resume: bool = False, generate=generate_prd) -> dict:
+    """Generate PRDs for many ideas on a pool of worker threads.
+
+    Results are written as each idea finishes. An idea that exceeds timeout
+    seconds is recorded as "timeout" and its worker slot is released; its
+    thread is abandoned (daemon, as are the workflow pools it may be waiting
+    on), so a slow idea never stalls the batch or its exit.
+    """
+    writer = BatchWriter(output)
+    done = writer.completed_ids() if resume else set()
+    pending = [item for item in ideas if item["id"] not in done]
+    logging.info(f"Batch: {len(pending)} to run, {len(ideas) - len(pending)} already done")
+
+    results = queue.Queue()
+    running = {}  # id -> (item, start time)
+    counts = {"ok": 0, "error": 0, "timeout": 0, "skipped": len(ideas) - len(pending)}
+
+    def work(item):
+        started = time.perf_counter()
+        try:
+            result = generate(item["idea"])
+            if result["stage"] != "complete":
+                raise RuntimeError(result["error"])
+            timings = {stage: round(seconds, 3) for stage, seconds in result["timings"].items()}
+            outcome = {"status": "ok", "prd": result["prd"], "timings": timings}
+            results.put((item, outcome, time.perf_counter() - started))
+        except Exception as e:
+            results.put((item, {"status": "error", "error": str(e)}, time.perf_counter() - started))
+
+    def record(item, outcome, seconds):
+        counts[outcome["status"]] += 1
+        writer.write({"id": item["id"], "idea": item["idea"], "seconds": round(seconds, 3), **outcome})
+        logging.info(f"Batch item {item['id']}: {outcome['status']} in {seconds:.1f}s")
+
+    queue_index = 0
+    while queue_index < len(pending) or running:
+        while queue_index < len(pending) and len(running) < workers:
+            item = pending[queue_index]
+            queue_index += 1
+            running[item["id"]] = (item, time.perf_counter())
+            threading.Thread(target=work, args=(item,), daemon=True).start()
+
+        next_deadline = min(started + timeout for _, started in running.values())
+        try:
+            item, outcome, seconds = results.get(timeout=max(0.0, next_deadline - time.perf_counter()))
+            if running.pop(item["id"], None) is not None:
+                record(item, outcome, seconds)
+        except queue.Empty:
+            pass
+
+        now = time.perf_counter()
+        for item_id, (item, started) in list(running.items()):
+            if now - started >= timeout:
+                del running[item_id]
+                record(item, {"status": "timeout", "error": f"exceeded {timeout}s"}, now - started)
+
+    return counts
@@ -0,0 +1,750 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the PRD generator
+Run with: python benchmarks.py intent
+          python benchmarks.py load --sessions 50
+          python benchmarks.py sections
+          python benchmarks.py suite [--save]
+          python benchmarks.py speculation
+          python benchmarks.py startup
+          python benchmarks.py prefix
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def bench_intent(iterations: int = 2000) -> dict:
+    """Latency and accuracy of the local intent pre-classifier on the prompt examples"""
+    from intent import INTENT_EXAMPLES, pre_classify
+
+    latencies_us = []
+    correct = 0
+    fallbacks = 0
+
+    for text, expected in INTENT_EXAMPLES:
+        label, confidence = pre_classify(text)
+        if label is None:
+            fallbacks += 1
+        elif label == expected:
+            correct += 1
+        print(f"  {expected:>5} | {str(label):>5} ({confidence:.2f}) | {text}")
+
+        for _ in range(iterations):
+            started = time.perf_counter()
+            pre_classify(text)
+            latencies_us.append((time.perf_counter() - started) * 1e6)
+
+    decided = len(INTENT_EXAMPLES) - fallbacks
+    return {
+        "examples": len(INTENT_EXAMPLES),
+        "accuracy_when_decided": correct / decided if decided else 0.0,
+        "fallback_rate": fallbacks / len(INTENT_EXAMPLES),
+        "p50_us": percentile(latencies_us, 50),
+        "p95_us": percentile(latencies_us, 95),
+        "p99_us": percentile(latencies_us, 99),
+        "mean_us": statistics.fmean(latencies_us),
+    }
+
+def use_stub_server(server, cache: bool = False):
+    """Point every agent at a stub server (or a list of them) and web research at the local fixture"""
+    from config import OLLAMA_VL_CONFIG, ROLE_LLM_CONFIGS, CACHE_CONFIG, RESEARCH_CONFIG
+    from research import FixtureBackend, set_backend
+    servers = server if isinstance(server, list) else [server]
+    template = OLLAMA_VL_CONFIG["config_list"][0]
+    # Config dicts are shared by reference, so agents built after this use the stub
+    OLLAMA_VL_CONFIG["config_list"][:] = [dict(template, base_url=s.base_url + "/v1") for s in servers]
+    ROLE_LLM_CONFIGS.clear()
+    CACHE_CONFIG["enabled"] = cache
+    set_backend(FixtureBackend(RESEARCH_CONFIG["fixture_path"]))
+
+SESSION_SCRIPT = [
+    "I want to build a mobile app for booking dog walkers",
+    "Busy pet owners in cities and independent dog walkers",
+    "Booking, live GPS tracking of walks, in-app payments and reviews",
+    "iOS and Android, integrate with Stripe, launch in six months",
+]
+
+async def _run_session(index: int, turn_latencies: list, ttfts: list) -> str:
+    """Drive one AsyncPRDWorkflow session through the scripted turns"""
+    from async_workflow import AsyncPRDWorkflow
+
+    workflow = AsyncPRDWorkflow()
+    stage = "initial"
+    for text in SESSION_SCRIPT:
+        started = time.perf_counter()
+        first_token = None
+        async for event in workflow.stream_input(f"{text} (session {index})"):
+            if event["event"] == "token" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif event["event"] == "result":
+                stage = event["result"]["stage"]
+        turn_latencies.append(time.perf_counter() - started)
+        if first_token is not None:
+            ttfts.append(first_token)
+        if stage != "requirements_gathering":
+            break
+    return stage
+
+def bench_load(sessions: int = 20, concurrency: int = 4, token_latency: float = 0.005,
+               endpoints: int = 1) -> dict:
+    """Run N concurrent async sessions against one or more local stub servers"""
+    from stub_server import StubLLMServer
+    from config import LLM_POOL_CONFIG
+
+    LLM_POOL_CONFIG["max_concurrency"] = concurrency
+    turn_latencies, ttfts = [], []
+
+    async def run_all():
+        return await asyncio.gather(*(
+            _run_session(i, turn_latencies, ttfts) for i in range(sessions)
+        ))
+
+    servers = [StubLLMServer(token_latency=token_latency).start() for _ in range(endpoints)]
+    try:
+        use_stub_server(servers)
+        started = time.perf_counter()
+        stages = asyncio.run(run_all())
+        elapsed = time.perf_counter() - started
+    finally:
+        for server in servers:
+            server.stop()
+
+    return {
+        "sessions": sessions,
+        "completed": stages.count("complete"),
+        "wall_seconds": elapsed,
+        "sessions_per_second": sessions / elapsed,
+        "endpoints": endpoints,
+        "model_requests": sum(server.requests for server in servers),
+        "requests_per_endpoint": "/".join(str(server.requests) for server in servers),
+        "endpoint_concurrency_limit": concurrency,
+        "server_peak_concurrency": max(server.peak_active for server in servers),
+        "turn_p50_s": percentile(turn_latencies, 50),
+        "turn_p95_s": percentile(turn_latencies, 95),
+        "turn_p99_s": percentile(turn_latencies, 99),
+        "ttft_p50_s": percentile(ttfts, 50),
+        "ttft_p95_s": percentile(ttfts, 95),
+    }
+
+def _run_prd_session(mode: str) -> dict:
+    """One scripted PRDWorkflow session; times the turn that writes the PRD"""
+    from config import PRD_CONFIG
+    from workflow import PRDWorkflow
+    from agents import shared_agents
+    from sections import parse_sections
+
+    PRD_CONFIG["mode"] = mode
+    workflow = PRDWorkflow()
+    result, prd_seconds = {}, 0.0
+    for text in SESSION_SCRIPT:
+        started = time.perf_counter()
+        result = workflow.process_input(f"{text} ({mode})")
+        if result.get("stage") == "complete":
+            prd_seconds = time.perf_counter() - started
+            break
+
+    prd = str(result.get("prd", ""))
+    headings = [section.heading for section in parse_sections(shared_agents['prd_agent'].system_message)]
+    return {
+        "prd_turn_s": prd_seconds,
+        "sections_present": sum(heading in prd for heading in headings),
+        "sections_expected": len(headings),
+        "prd_chars": len(prd),
+    }
+
+def bench_sections(token_latency: float = 0.005, base_url: str = None) -> dict:
+    """Single-shot vs section-parallel PRD generation, on the stub or a real endpoint"""
+    from stub_server import StubLLMServer
+
+    def compare():
+        single = _run_prd_session("single")
+        sectioned = _run_prd_session("sectioned")
+        results = {f"single_{k}": v for k, v in single.items()}
+        results.update({f"sectioned_{k}": v for k, v in sectioned.items()})
+        if sectioned["prd_turn_s"]:
+            results["speedup"] = single["prd_turn_s"] / sectioned["prd_turn_s"]
+        return results
+
+    if base_url:
+        from config import OLLAMA_VL_CONFIG
+        OLLAMA_VL_CONFIG["config_list"][0]["base_url"] = base_url
+        return compare()
+
+    with StubLLMServer(token_latency=token_latency) as server:
+        use_stub_server(server)
+        return compare()
+
+# Longer scripted session for the suite; every requirement area is covered by the
+# success-metrics line, and the stub would also complete requirements on the last line
+SUITE_SCRIPT = SESSION_SCRIPT + [
+    "Walkers set their own rates and we take a 15% commission",
+    "Owners must be able to see walker background checks before booking",
+    "Success means 10,000 completed walks in the first quarter",
+    "That's everything I have",
+]
+COMPLETE_TRIGGER = "That's everything"
+REFINE_TURN = "Please improve the risk assessment with data privacy risks"
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+def _workflow_session(index: int) -> tuple:
+    """Full PRDWorkflow session plus one refinement; returns (turn latencies, prompt tokens)"""
+    from workflow import PRDWorkflow
+
+    workflow = PRDWorkflow()
+    latencies = []
+    for text in SUITE_SCRIPT + [REFINE_TURN]:
+        started = time.perf_counter()
+        result = workflow.process_input(f"{text} (session {index})" if text == SUITE_SCRIPT[0] else text)
+        latencies.append(time.perf_counter() - started)
+        if text != REFINE_TURN and result.get("stage") == "complete":
+            started = time.perf_counter()
+            workflow.process_input(REFINE_TURN)
+            latencies.append(time.perf_counter() - started)
+            break
+    return latencies, list(workflow.context.prompt_tokens)
+
+def _generate_prd_session(index: int) -> tuple:
+    """One single-input generate_prd call, timed as one turn"""
+    from workflow import generate_prd
+
+    started = time.perf_counter()
+    generate_prd(" ".join(SUITE_SCRIPT) + f" (session {index})")
+    return [time.perf_counter() - started], []
+
+def _ui_session(index: int) -> tuple:
+    """Drive ui.py turn by turn through Streamlit's AppTest"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui.py"),
+                            default_timeout=600)
+    app.run()
+    latencies = []
+    for text in SUITE_SCRIPT + [REFINE_TURN]:
+        started = time.perf_counter()
+        app.chat_input[0].set_value(f"{text} (session {index})" if text == SUITE_SCRIPT[0] else text).run()
+        latencies.append(time.perf_counter() - started)
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        if text != REFINE_TURN and app.session_state.workflow.stage == "complete":
+            started = time.perf_counter()
+            app.chat_input[0].set_value(REFINE_TURN).run()
+            latencies.append(time.perf_counter() - started)
+            break
+    return latencies, list(app.session_state.workflow.context.prompt_tokens)
+
+SUITE_SCENARIOS = {
+    "workflow": _workflow_session,
+    "generate_prd": _generate_prd_session,
+    "ui": _ui_session,
+}
+
+def _run_scenario(run_session, sessions: int) -> dict:
+    """Run sessions one after another, tracking latency, prompt growth and peak memory.
+
+    A warm-up session first keeps imports and agent construction out of the
+    numbers; peak memory comes from one extra session under tracemalloc so
+    tracing overhead stays out of the latencies.
+    """
+    run_session(-1)
+
+    turn_latencies, prompt_runs = [], []
+    started = time.perf_counter()
+    for i in range(sessions):
+        latencies, prompt_tokens = run_session(i)
+        turn_latencies.extend(latencies)
+        prompt_runs.append(prompt_tokens)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    run_session(sessions)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results = {
+        "sessions": sessions,
+        "turns": len(turn_latencies),
+        "sessions_per_second": sessions / elapsed,
+        "turns_per_second": len(turn_latencies) / elapsed,
+        "turn_p50_s": percentile(turn_latencies, 50),
+        "turn_p95_s": percentile(turn_latencies, 95),
+        "turn_p99_s": percentile(turn_latencies, 99),
+        "peak_session_memory_mb": peak / 2 ** 20,
+    }
+    # Mean prompt tokens of the n-th context-built model call across sessions
+    calls = min((len(run) for run in prompt_runs), default=0)
+    if calls:
+        per_call = [statistics.mean(run[i] for run in prompt_runs) for i in range(calls)]
+        results["prompt_tokens_first"] = per_call[0]
+        results["prompt_tokens_last"] = per_call[-1]
+        results["prompt_growth_per_turn"] = (per_call[-1] - per_call[0]) / max(1, calls - 1)
+    return results
+
+def bench_suite(sessions: int = 3, token_latency: float = 0.001, first_token_latency: float = 0.0,
+                scenarios: list = None) -> dict:
+    """Multi-turn sessions through each entry point against the deterministic stub server"""
+    from stub_server import StubLLMServer, make_reply_fn
+
+    reply_fn = make_reply_fn(complete_after=len(SUITE_SCRIPT), complete_trigger=COMPLETE_TRIGGER)
+    results = {}
+    with StubLLMServer(reply_fn=reply_fn, token_latency=token_latency,
+                       first_token_latency=first_token_latency) as server:
+        use_stub_server(server)
+        for name in scenarios or SUITE_SCENARIOS:
+            try:
+                results[name] = _run_scenario(SUITE_SCENARIOS[name], sessions)
+            except ImportError as e:
+                logging.warning(f"Skipping {name} scenario: {e}")
+    return results
+
+def bench_speculation(sessions: int = 3, think_time: float = 2.0, token_latency: float = 0.002) -> dict:
+    """PRD-turn latency with and without speculative drafts, with a pause per turn for the user typing"""
+    from stub_server import StubLLMServer, make_reply_fn
+    from config import SPECULATION_CONFIG
+    from metrics import registry
+    from workflow import PRDWorkflow
+
+    def run(enabled: bool) -> list:
+        SPECULATION_CONFIG["enabled"] = enabled
+        prd_turns = []
+        for index in range(sessions):
+            workflow = PRDWorkflow()
+            for text in SUITE_SCRIPT:
+                started = time.perf_counter()
+                result = workflow.process_input(f"{text} ({enabled}, {index})" if text == SUITE_SCRIPT[0] else text)
+                if result.get("stage") == "complete":
+                    prd_turns.append(time.perf_counter() - started)
+                    break
+                time.sleep(think_time)
+        return prd_turns
+
+    reply_fn = make_reply_fn(complete_after=len(SUITE_SCRIPT), complete_trigger=COMPLETE_TRIGGER)
+    with StubLLMServer(reply_fn=reply_fn, token_latency=token_latency) as server:
+        use_stub_server(server)
+        baseline = run(False)
+        registry.reset()
+        speculative = run(True)
+
+    counts = {labels["outcome"]: value for name, labels, value in registry.snapshot()["counters"]
+              if name == "prd_speculation_total"}
+    started = sum(value for name, _, value in registry.snapshot()["counters"]
+                  if name == "prd_speculation_started_total")
+    return {
+        "sessions": sessions,
+        "think_time_s": think_time,
+        "prd_turn_p50_s": percentile(baseline, 50),
+        "speculative_prd_turn_p50_s": percentile(speculative, 50),
+        "drafts_started": started,
+        "drafts_hit": counts.get("hit", 0),
+        "drafts_patched": counts.get("patched", 0),
+        "drafts_missed": counts.get("miss", 0),
+        "drafts_unused": counts.get("unused", 0),
+        "hit_rate": (counts.get("hit", 0) + counts.get("patched", 0)) / started if started else 0.0,
+    }
+
+# What the simulated user says about each area when asked; one area per answer
+GATHERING_ANSWERS = {
+    "product_purpose": "The product is a way to get a dog walked on short notice.",
+    "target_users": "Busy pet owners in cities and independent dog walkers.",
+    "functional": "Booking, live GPS tracking of walks and reviews.",
+    "technical": "iOS and Android, and it has to work offline.",
+    "integration": "Payments through Stripe.",
+    "timeline_scope": "An MVP launch in six months.",
+    "success_metrics": "Success means 10,000 completed walks and 40% retention.",
+    "business_context": "We take a 15% commission on each walk.",
+}
+
+def bench_gathering(sessions: int = 3, token_latency: float = 0.001) -> dict:
+    """Model calls and user turns per PRD: one question per turn until every area is covered,
+    against the configured threshold, turn cap and multi-question turns.
+
+    The simulated user answers exactly the areas each question names.
+    """
+    from stub_server import StubLLMServer, make_reply_fn
+    from config import GATHERING_CONFIG
+    from metrics import registry, gathering_summary
+    from requirements_state import AREA_LABELS
+    from workflow import PRDWorkflow
+
+    def run(name: str, settings: dict) -> dict:
+        saved = dict(GATHERING_CONFIG)
+        GATHERING_CONFIG.update(settings)
+        registry.reset()
+        latencies = []
+        try:
+            for index in range(sessions):
+                workflow = PRDWorkflow()
+                text = f"{SESSION_SCRIPT[0]} ({name} {index})"
+                while True:
+                    started = time.perf_counter()
+                    result = workflow.process_input(text)
+                    latencies.append(time.perf_counter() - started)
+                    if result.get("stage") != "requirements_gathering":
+                        break
+                    question = str(result["response"])
+                    asked = [area for area, label in AREA_LABELS.items() if label in question]
+                    text = " ".join(GATHERING_ANSWERS[area] for area in asked or [workflow.requirements.asking])
+        finally:
+            GATHERING_CONFIG.clear()
+            GATHERING_CONFIG.update(saved)
+        summary = gathering_summary()
+        conversation = sum(v for n, l, v in registry.snapshot()["counters"]
+                           if n == "prd_model_calls_total" and l["agent"] == "conversation_agent")
+        return {
+            "turns_per_prd": summary["turns_per_prd"],
+            "model_calls_per_prd": summary["model_calls_per_prd"],
+            "questions_per_prd": conversation / summary["prds"] if summary["prds"] else 0.0,
+            "session_s": sum(latencies) / sessions,
+        }
+
+    # Never ask the model for completion, so only the local rules end gathering
+    reply_fn = make_reply_fn(complete_after=1000)
+    with StubLLMServer(reply_fn=reply_fn, token_latency=token_latency) as server:
+        use_stub_server(server)
+        strict = run("strict", {"completion_threshold": len(AREA_LABELS), "max_turns": 0,
+                                "multi_question_below": 0})
+        adaptive = run("adaptive", {})
+
+    results = {"sessions": sessions}
+    for name, metrics in (("strict", strict), ("adaptive", adaptive)):
+        for key, value in metrics.items():
+            results[f"{name}_{key}"] = value
+    results["model_calls_saved_per_prd"] = strict["model_calls_per_prd"] - adaptive["model_calls_per_prd"]
+    return results
+
+def bench_coalesce(copies: int = 8, token_latency: float = 0.002) -> dict:
+    """Upstream model requests for one idea submitted many times at once, with and without single-flight.
+
+    Runs the batch runner (threads) and AsyncPRDWorkflow.generate (asyncio)
+    with the response cache off, so only in-flight calls can be shared.
+    """
+    from stub_server import StubLLMServer, make_reply_fn
+    from config import SINGLE_FLIGHT_CONFIG
+    from async_workflow import AsyncPRDWorkflow
+    from batch import run_batch
+    import tempfile
+
+    idea = SESSION_SCRIPT[0]
+
+    def run(enabled: bool, mode: str) -> tuple:
+        SINGLE_FLIGHT_CONFIG["enabled"] = enabled
+        with StubLLMServer(reply_fn=make_reply_fn(), token_latency=token_latency) as server:
+            use_stub_server(server)
+            started = time.perf_counter()
+            if mode == "batch":
+                with tempfile.TemporaryDirectory() as output:
+                    run_batch([{"id": str(i), "idea": idea} for i in range(copies)],
+                              os.path.join(output, "results.jsonl"), workers=copies)
+            else:
+                async def generate_all():
+                    await asyncio.gather(*(AsyncPRDWorkflow().generate(idea) for _ in range(copies)))
+                asyncio.run(generate_all())
+            return server.requests, time.perf_counter() - started
+
+    enabled = SINGLE_FLIGHT_CONFIG["enabled"]
+    results = {"copies": copies}
+    try:
+        for mode in ("batch", "async"):
+            for name, flag in (("separate", False), ("single_flight", True)):
+                requests, seconds = run(flag, mode)
+                results[f"{mode}_{name}_requests"] = requests
+                results[f"{mode}_{name}_s"] = seconds
+    finally:
+        SINGLE_FLIGHT_CONFIG["enabled"] = enabled
+    return results
+
+def bench_admission(batch: int = 8, interactive: int = 4, slots: int = 2, token_latency: float = 0.002) -> dict:
+    """Interactive gathering-turn latency while one-shot PRDs share the endpoint.
+
+    Runs the interactive sessions alone, then next to the batch with every
+    call in one priority class, then with the configured priorities.
+    """
+    from stub_server import StubLLMServer, make_reply_fn
+    from config import ADMISSION_CONFIG, LLM_POOL_CONFIG
+    from async_workflow import AsyncPRDWorkflow
+
+    async def interactive_session(name: str, index: int, latencies: list):
+        workflow = AsyncPRDWorkflow()
+        for text in SESSION_SCRIPT[:3]:
+            started = time.perf_counter()
+            await workflow.process_input(f"{text} ({name} {index})" if text == SESSION_SCRIPT[0] else text)
+            latencies.append(time.perf_counter() - started)
+
+    def run(name: str, batch_size: int, priorities: dict) -> dict:
+        ADMISSION_CONFIG["priorities"] = priorities
+        latencies = []
+
+        async def run_all():
+            jobs = [asyncio.ensure_future(AsyncPRDWorkflow().generate(f"{SESSION_SCRIPT[0]} ({name} batch {i})"))
+                    for i in range(batch_size)]
+            if jobs:
+                await asyncio.sleep(0.2)  # let the batch fill the queue first
+            started = time.perf_counter()
+            await asyncio.gather(*(interactive_session(name, i, latencies) for i in range(interactive)))
+            results = await asyncio.gather(*jobs)
+            return time.perf_counter() - started, results
+
+        with StubLLMServer(reply_fn=make_reply_fn(complete_after=1000), token_latency=token_latency) as server:
+            use_stub_server(server)
+            elapsed, results = asyncio.run(run_all())
+        return {
+            "turn_p50_s": percentile(latencies, 50),
+            "turn_p95_s": percentile(latencies, 95),
+            "batch_ok": sum(1 for result in results if result["stage"] == "complete"),
+            "s": elapsed,
+        }
+
+    saved = dict(ADMISSION_CONFIG), LLM_POOL_CONFIG["max_concurrency"]
+    LLM_POOL_CONFIG["max_concurrency"] = slots
+    try:
+        idle = run("idle", 0, ADMISSION_CONFIG["priorities"])
+        single_class = run("single_class", batch, {})
+        prioritized = run("prioritized", batch, saved[0]["priorities"])
+    finally:
+        ADMISSION_CONFIG.update(saved[0])
+        LLM_POOL_CONFIG["max_concurrency"] = saved[1]
+
+    results = {"batch": batch, "interactive_sessions": interactive, "slots": slots,
+               "idle_turn_p50_s": idle["turn_p50_s"], "idle_turn_p95_s": idle["turn_p95_s"]}
+    for name, metrics in (("single_class", single_class), ("prioritized", prioritized)):
+        for key, value in metrics.items():
+            results[f"{name}_{key}"] = value
+    return results
+
+def bench_prefix(sessions: int = 4, prompt_token_latency: float = 0.002, endpoints: int = 2) -> dict:
+    """Prompt-eval time per turn with the servers' prefix cache, with and without endpoint affinity.
+
+    The stub servers charge prompt_token_latency per prompt token outside a
+    cached prefix (0.002s is ~500 tokens/s, a small model on CPU).
+    """
+    from stub_server import StubLLMServer, make_reply_fn
+    from config import ROUTER_CONFIG
+    from metrics import registry
+    from workflow import PRDWorkflow
+    from concurrent.futures import ThreadPoolExecutor
+
+    reply_fn = make_reply_fn(complete_after=len(SUITE_SCRIPT), complete_trigger=COMPLETE_TRIGGER)
+
+    def run(kv_slots: int, affinity_slack: int) -> dict:
+        ROUTER_CONFIG["affinity_slack"] = affinity_slack
+        registry.reset()
+        servers = [StubLLMServer(reply_fn=reply_fn, prompt_token_latency=prompt_token_latency,
+                                 kv_slots=kv_slots).start() for _ in range(endpoints)]
+        try:
+            use_stub_server(servers)
+            latencies = []
+
+            def session(index: int):
+                workflow = PRDWorkflow()
+                for text in SUITE_SCRIPT + [REFINE_TURN]:
+                    started = time.perf_counter()
+                    workflow.process_input(f"{text} (prefix {kv_slots} {affinity_slack} {index})"
+                                           if text == SUITE_SCRIPT[0] else text)
+                    latencies.append(time.perf_counter() - started)
+
+            # Concurrent sessions, so balancing by load alone would scatter a session's calls
+            with ThreadPoolExecutor(max_workers=sessions) as pool:
+                list(pool.map(session, range(sessions)))
+        finally:
+            for server in servers:
+                server.stop()
+        prompt = sum(server.prompt_tokens for server in servers)
+        evaluated = sum(server.evaluated_tokens for server in servers)
+        return {
+            "turns": len(latencies),
+            "turn_p50_s": percentile(latencies, 50),
+            "eval_s_per_turn": evaluated * prompt_token_latency / len(latencies),
+            "cached_fraction": 1 - evaluated / prompt if prompt else 0.0,
+            "keep_alives": sum(server.keep_alive_requests for server in servers),
+        }
+
+    slack = ROUTER_CONFIG["affinity_slack"]
+    try:
+        cold = run(kv_slots=0, affinity_slack=slack)
+        unpinned = run(kv_slots=4, affinity_slack=-1)
+        pinned = run(kv_slots=4, affinity_slack=max(slack, 0))
+    finally:
+        ROUTER_CONFIG["affinity_slack"] = slack
+
+    results = {"sessions": sessions, "endpoints": endpoints}
+    for name, metrics in (("no_cache", cold), ("unpinned", unpinned), ("pinned", pinned)):
+        for key, value in metrics.items():
+            results[f"{name}_{key}"] = value
+    results["saved_s_per_turn"] = cold["eval_s_per_turn"] - pinned["eval_s_per_turn"]
+    return results
+
+# Cold-start target for CLI invocations that make no model calls (main.py --help)
+STARTUP_TARGET_S = 0.15
+
+def bench_startup(runs: int = 10) -> dict:
+    """Wall time of fresh interpreters running the CLI entry points, without model calls"""
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    commands = {
+        "python_bare": [sys.executable, "-c", "pass"],
+        "main_help": [sys.executable, "main.py", "--help"],
+        "import_workflow": [sys.executable, "-c", "import workflow"],
+    }
+    results = {"runs": runs}
+    for name, command in commands.items():
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(command, cwd=here, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - started)
+        results[f"{name}_p50_s"] = percentile(samples, 50)
+    results["target_s"] = STARTUP_TARGET_S
+    return results
+
+# Metrics compared against the baseline, and which direction is better
+LOWER_IS_BETTER = ("turn_p50_s", "turn_p95_s", "turn_p99_s", "peak_session_memory_mb",
+                   "prompt_tokens_last", "prompt_growth_per_turn")
+HIGHER_IS_BETTER = ("sessions_per_second", "turns_per_second")
+
+def compare_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions beyond tolerance (a fraction) as readable lines"""
+    regressions = []
+    for scenario, metrics in results.items():
+        for key, value in metrics.items():
+            expected = baseline.get(scenario, {}).get(key)
+            if not expected:
+                continue
+            if key in LOWER_IS_BETTER and value > expected * (1 + tolerance):
+                regressions.append(f"{scenario}.{key}: {value:.3f} > baseline {expected:.3f}")
+            elif key in HIGHER_IS_BETTER and value < expected * (1 - tolerance):
+                regressions.append(f"{scenario}.{key}: {value:.3f} < baseline {expected:.3f}")
+    return regressions
+
+def report(name: str, results: dict):
+    """Print benchmark results as aligned key/value lines"""
+    print(f"\n{name}")
+    print("-" * 50)
+    for key, value in results.items():
+        shown = f"{value:.3f}" if isinstance(value, float) else value
+        print(f"  {key:<28} {shown}")
+
+def main():
+    parser = argparse.ArgumentParser(description="PRD generator benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    intent_parser = commands.add_parser("intent", help="local intent pre-classifier")
+    intent_parser.add_argument("--iterations", type=int, default=2000)
+
+    load_parser = commands.add_parser("load", help="concurrent async sessions against a stub server")
+    load_parser.add_argument("--sessions", type=int, default=20)
+    load_parser.add_argument("--concurrency", type=int, default=4)
+    load_parser.add_argument("--token-latency", type=float, default=0.005)
+    load_parser.add_argument("--endpoints", type=int, default=1, help="stub servers to balance across")
+
+    sections_parser = commands.add_parser("sections", help="single-shot vs section-parallel PRD generation")
+    sections_parser.add_argument("--token-latency", type=float, default=0.005)
+    sections_parser.add_argument("--base-url", help="OpenAI-compatible endpoint to use instead of the stub")
+
+    suite_parser = commands.add_parser("suite", help="multi-turn sessions through every entry point, "
+                                                     "checked against a stored baseline")
+    suite_parser.add_argument("--sessions", type=int, default=3)
+    suite_parser.add_argument("--token-latency", type=float, default=0.001)
+    suite_parser.add_argument("--first-token-latency", type=float, default=0.0)
+    suite_parser.add_argument("--scenario", action="append", choices=list(SUITE_SCENARIOS),
+                              help="run only these scenarios (repeatable)")
+    suite_parser.add_argument("--baseline", default=BASELINE_PATH)
+    suite_parser.add_argument("--save", action="store_true", help="store these results as the baseline")
+    suite_parser.add_argument("--tolerance", type=float, default=0.25,
+                              help="allowed regression as a fraction of the baseline (default: 0.25)")
+
+    speculation_parser = commands.add_parser("speculation", help="PRD turn latency with speculative drafts")
+    speculation_parser.add_argument("--sessions", type=int, default=3)
+    speculation_parser.add_argument("--think-time", type=float, default=2.0,
+                                    help="seconds the simulated user spends typing each answer")
+    speculation_parser.add_argument("--token-latency", type=float, default=0.002)
+
+    gathering_parser = commands.add_parser("gathering", help="model calls per PRD with adaptive completion")
+    gathering_parser.add_argument("--sessions", type=int, default=3)
+    gathering_parser.add_argument("--token-latency", type=float, default=0.001)
+
+    coalesce_parser = commands.add_parser("coalesce", help="identical concurrent ideas with and without single-flight")
+    coalesce_parser.add_argument("--copies", type=int, default=8)
+    coalesce_parser.add_argument("--token-latency", type=float, default=0.002)
+
+    admission_parser = commands.add_parser("admission", help="interactive latency while batch PRDs run")
+    admission_parser.add_argument("--batch", type=int, default=8)
+    admission_parser.add_argument("--interactive", type=int, default=4)
+    admission_parser.add_argument("--slots", type=int, default=2, help="concurrent calls the endpoint runs")
+    admission_parser.add_argument("--token-latency", type=float, default=0.002)
+
+    prefix_parser = commands.add_parser("prefix", help="prompt-eval time saved by prefix caching and affinity")
+    prefix_parser.add_argument("--sessions", type=int, default=4)
+    prefix_parser.add_argument("--prompt-token-latency", type=float, default=0.002)
+    prefix_parser.add_argument("--endpoints", type=int, default=2)
+
+    startup_parser = commands.add_parser("startup", help="cold-start time of the CLI entry points")
+    startup_parser.add_argument("--runs", type=int, default=10)
+
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.command == "intent":
+        report("Intent pre-classifier", bench_intent(args.iterations))
+    elif args.command == "load":
+        report("Concurrent session load test", bench_load(args.sessions, args.concurrency,
+                                                            args.token_latency, args.endpoints))
+    elif args.command == "sections":
+        report("PRD generation: single-shot vs sectioned", bench_sections(args.token_latency, args.base_url))
+    elif args.command == "speculation":
+        report("Speculative PRD drafts", bench_speculation(args.sessions, args.think_time, args.token_latency))
+    elif args.command == "gathering":
+        report("Requirements gathering", bench_gathering(args.sessions, args.token_latency))
+    elif args.command == "coalesce":
+        report("Single-flight model calls", bench_coalesce(args.copies, args.token_latency))
+    elif args.command == "admission":
+        report("Admission control", bench_admission(args.batch, args.interactive, args.slots, args.token_latency))
+    elif args.command == "prefix":
+        report("Prompt prefix reuse", bench_prefix(args.sessions, args.prompt_token_latency, args.endpoints))
+    elif args.command == "startup":
+        results = bench_startup(args.runs)
+        report("Cold start", results)
+        if results["main_help_p50_s"] > STARTUP_TARGET_S:
+            print(f"\nmain.py --help is over the {STARTUP_TARGET_S:.2f}s cold-start target")
+            sys.exit(1)
+    elif args.command == "suite":
+        run_suite(args)
+
+def run_suite(args):
+    """Run the suite, then save it as the baseline or check it against the stored one"""
+    results = bench_suite(args.sessions, args.token_latency, args.first_token_latency, args.scenario)
+    for name, metrics in results.items():
+        report(f"Suite: {name}", metrics)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save to create one")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare_baseline(results, json.load(f), args.tolerance)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from config import CACHE_CONFIG, CACHED_AGENTS
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+# Config keys that select the endpoint rather than the completion
+_NON_SAMPLING_KEYS = {"base_url", "api_key", "api_type"}
+
+def make_key(config: dict, system_message: str, messages: list) -> str:
+    """Content address for a completion: model, system prompt, messages and sampling params"""
+    params = {k: v for k, v in config.items() if k not in _NON_SAMPLING_KEYS}
+    payload = json.dumps({
+        "params": params,
+        "system_message": system_message,
+        "messages": messages
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """SQLite-backed LLM response cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL
+        )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    def get(self, key: str):
+        """Return the cached response, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str):
+        """Store a response and evict least recently used entries over the cap"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+            self._db.commit()
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": size,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide response cache, or None when caching is disabled"""
+    global _cache
+    if not CACHE_CONFIG["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                CACHE_CONFIG["path"],
+                ttl_seconds=CACHE_CONFIG["ttl_seconds"],
+                max_entries=CACHE_CONFIG["max_entries"]
+            )
+            logging.info(f"Response cache opened at {CACHE_CONFIG['path']}")
+    return _cache
+
+def cache_for(agent_name: str):
+    """Response cache for an agent that opted in via CACHED_AGENTS, else None"""
+    if agent_name not in CACHED_AGENTS:
+        return None
+    return get_cache()
+
+def agent_cache_key(agent, messages: list) -> str:
+    """Cache key for an agent reply to the given messages"""
+    config = {k: v for k, v in agent.llm_config.items() if k not in ("config_list", "cache_seed")}
+    config.update(agent.llm_config["config_list"][0])
+    return make_key(config, agent.system_message, messages)
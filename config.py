@@ -16,14 +16,185 @@ load_dotenv()
 #     "cache_seed": None,  # No caching for testing
 # }
 
-OLLAMA_VL_CONFIG = {
-    "config_list": [{
-        "model": os.getenv("OLLAMA_MODEL", "qwen2.5vl:3b"),
-        "base_url": os.getenv("OLLAMA_HOST", "http://localhost:11434") + "/v1",
+# Ollama keeps the KV cache of recent prompts while a model stays loaded, so a
+# prompt that starts like an earlier one skips re-evaluating that prefix.
+# keep_alive holds the model in memory between a user's turns (see llm.py).
+PROMPT_CACHE_CONFIG = {
+    "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),  # "" leaves the server default
+    "refresh_seconds": float(os.getenv("OLLAMA_KEEP_ALIVE_REFRESH_SECONDS", "60")),
+    "slots": int(os.getenv("OLLAMA_NUM_PARALLEL", "4")),  # cached prompts per server
+}
+
+def _endpoints(hosts: str, model: str) -> list:
+    """One config_list entry per comma-separated Ollama host"""
+    extra_body = {"think": False}  # Disable thinking mode
+    if PROMPT_CACHE_CONFIG["keep_alive"]:
+        extra_body["keep_alive"] = PROMPT_CACHE_CONFIG["keep_alive"]
+    return [{
+        "model": model,
+        "base_url": host.strip().rstrip("/") + "/v1",
         "api_key": "ollama",  # Required but not used
-        "extra_body": {
-            "think": False  # Disable thinking mode
+        "extra_body": dict(extra_body)
+    } for host in hosts.split(",") if host.strip()]
+
+# OLLAMA_HOST may list several servers (comma-separated); calls are balanced
+# across them by router.py
+OLLAMA_VL_CONFIG = {
+    "config_list": _endpoints(os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+                              os.getenv("OLLAMA_MODEL", "qwen2.5vl:3b")),
+    "cache_seed": None,  # AutoGen's own cache is off; see CACHE_CONFIG below
+}
+
+# Per-role overrides, e.g. a small model for the classifier and a bigger one on
+# its own servers for the PRD: OLLAMA_MODEL_PRD_AGENT, OLLAMA_HOST_PRD_AGENT
+ROLE_LLM_CONFIGS = {}
+for _role in ("orchestrator", "intent_classifier", "conversation_agent", "requirements_extractor",
+              "research_agent", "prd_agent"):
+    _hosts = os.getenv(f"OLLAMA_HOST_{_role.upper()}")
+    _model = os.getenv(f"OLLAMA_MODEL_{_role.upper()}")
+    if _hosts or _model:
+        ROLE_LLM_CONFIGS[_role] = {
+            "config_list": _endpoints(_hosts or os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+                                      _model or os.getenv("OLLAMA_MODEL", "qwen2.5vl:3b")),
+            "cache_seed": None,
         }
-    }],
-    "cache_seed": None,  # No caching for testing
-}
\ No newline at end of file
+
+def llm_config_for(role: str) -> dict:
+    """LLM config for an agent role: its override if set, else OLLAMA_VL_CONFIG"""
+    return ROLE_LLM_CONFIGS.get(role, OLLAMA_VL_CONFIG)
+
+# Balancing and failover across a role's endpoints (see router.py).
+# strategy is "least_outstanding" or "latency" (outstanding calls x recent latency)
+ROUTER_CONFIG = {
+    "strategy": os.getenv("PRD_ROUTER_STRATEGY", "least_outstanding"),
+    "failure_threshold": int(os.getenv("PRD_ROUTER_FAILURE_THRESHOLD", "3")),
+    "cooldown_seconds": float(os.getenv("PRD_ROUTER_COOLDOWN_SECONDS", "30")),
+    "health_interval_seconds": float(os.getenv("PRD_ROUTER_HEALTH_INTERVAL_SECONDS", "15")),
+    "health_timeout_seconds": float(os.getenv("PRD_ROUTER_HEALTH_TIMEOUT_SECONDS", "2")),
+    # Calls with the same prompt prefix stick to one endpoint (where it is cached)
+    # unless it has this many more calls outstanding than the least busy one; -1 disables
+    "affinity_slack": int(os.getenv("PRD_ROUTER_AFFINITY_SLACK", "1")),
+}
+
+# Persistent response cache shared by all agents (see cache.py)
+CACHE_CONFIG = {
+    "enabled": os.getenv("PRD_CACHE_ENABLED", "1") == "1",
+    "path": os.getenv("PRD_CACHE_PATH", ".prd_cache.sqlite3"),
+    "ttl_seconds": float(os.getenv("PRD_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    "max_entries": int(os.getenv("PRD_CACHE_MAX_ENTRIES", "5000")),
+}
+
+# Agents whose replies are deterministic enough to reuse. The conversation
+# agent is excluded: its questions should follow the live dialogue.
+CACHED_AGENTS = {"intent_classifier", "requirements_extractor", "research_agent"}
+
+# Single-flight (see singleflight.py): identical non-streamed calls to these
+# agents that are in flight at the same time are made once and the reply is
+# shared. Covers the first wave of identical prompts, before anything is cached.
+SINGLE_FLIGHT_CONFIG = {
+    "enabled": os.getenv("PRD_SINGLE_FLIGHT", "1") == "1",
+    "agents": set(filter(None, os.getenv("PRD_SINGLE_FLIGHT_AGENTS", ",".join(sorted(CACHED_AGENTS))).split(","))),
+}
+
+# Local intent pre-classifier (see intent.py). Inputs scored at or above a
+# threshold skip the intent_classifier LLM call; the rest fall back to it.
+INTENT_CONFIG = {
+    "enabled": os.getenv("PRD_INTENT_LOCAL", "1") == "1",
+    "prd_threshold": float(os.getenv("PRD_INTENT_PRD_THRESHOLD", "0.85")),
+    "other_threshold": float(os.getenv("PRD_INTENT_OTHER_THRESHOLD", "0.85")),
+}
+
+# Conversation context budget (see context.py). History sent to the model is
+# capped at a fraction of the model's context window; older turns are rolled
+# into a running summary.
+CONTEXT_CONFIG = {
+    "context_window": int(os.getenv("OLLAMA_NUM_CTX", "8192")),
+    "history_fraction": float(os.getenv("PRD_HISTORY_FRACTION", "0.5")),
+    "summary_chars_per_turn": int(os.getenv("PRD_SUMMARY_CHARS_PER_TURN", "200")),
+    "cost_per_1k_tokens": float(os.getenv("PRD_COST_PER_1K_TOKENS", "0")),
+}
+
+# Shared async connection pool per model endpoint (see llm.py). Calls beyond
+# max_concurrency queue and are served round-robin across sessions.
+LLM_POOL_CONFIG = {
+    "max_concurrency": int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4")),
+    "max_connections": int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32")),
+    "timeout_seconds": float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "600")),
+}
+
+# Admission control in front of every model call (see scheduler.py). Each
+# endpoint runs at most max_concurrency calls (LLM_POOL_CONFIG); waiting calls
+# queue by priority, lower first, so interactive turns go ahead of research and
+# PRD jobs. Each priority queues at most max_queue calls per endpoint, and a call
+# that cannot start within max_wait_seconds is rejected with a retry-after.
+ADMISSION_CONFIG = {
+    "priorities": {
+        role: int(level) for role, level in (
+            pair.split("=") for pair in os.getenv(
+                "PRD_ADMISSION_PRIORITIES",
+                "intent_classifier=0,conversation_agent=0,requirements_extractor=1,research_agent=2,prd_agent=2",
+            ).split(",") if pair
+        )
+    },
+    "default_priority": int(os.getenv("PRD_ADMISSION_DEFAULT_PRIORITY", "1")),
+    "max_queue": int(os.getenv("PRD_ADMISSION_MAX_QUEUE", "32")),
+    "max_wait_seconds": float(os.getenv("PRD_ADMISSION_MAX_WAIT_SECONDS", "300")),
+}
+
+# Session store (see session_store.py): every turn is appended as it happens
+SESSION_CONFIG = {
+    "enabled": os.getenv("PRD_SESSIONS_ENABLED", "1") == "1",
+    "path": os.getenv("PRD_SESSIONS_PATH", ".prd_sessions.sqlite3"),
+}
+
+# HTTP API (see server.py): live workflows are kept in an LRU of this size;
+# evicted sessions are resumed from the session store on their next request
+SERVER_CONFIG = {
+    "host": os.getenv("PRD_SERVER_HOST", "127.0.0.1"),
+    "port": int(os.getenv("PRD_SERVER_PORT", "8000")),
+    "max_sessions": int(os.getenv("PRD_SERVER_MAX_SESSIONS", "256")),
+}
+
+# Web research feeding the research agent (see research.py)
+RESEARCH_CONFIG = {
+    "web_search": os.getenv("PRD_WEB_SEARCH", "1") == "1",
+    "backend": os.getenv("PRD_SEARCH_BACKEND", "duckduckgo"),  # or "fixture"
+    "fixture_path": os.getenv("PRD_SEARCH_FIXTURE",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_fixture.json")),
+    "max_results": int(os.getenv("PRD_SEARCH_MAX_RESULTS", "3")),
+    "cache_path": os.getenv("PRD_SEARCH_CACHE_PATH", ".prd_search_cache.sqlite3"),
+    "cache_ttl_seconds": float(os.getenv("PRD_SEARCH_CACHE_TTL_SECONDS", str(24 * 3600))),
+    "dedupe_threshold": float(os.getenv("PRD_SEARCH_DEDUPE_THRESHOLD", "0.6")),
+}
+
+# PRD generation: "single" asks prd_agent for the whole document in one call;
+# "sectioned" drafts the sections concurrently and merges them (see sections.py)
+PRD_CONFIG = {
+    "mode": os.getenv("PRD_GENERATION_MODE", "single"),
+    "max_parallel_sections": int(os.getenv("PRD_MAX_PARALLEL_SECTIONS", "9")),
+}
+
+# Requirements gathering (see requirements_state.py). The PRD is generated once
+# completion_threshold of the eight requirement areas are covered, or after
+# max_turns user messages whatever the coverage (0 = no cap). While fewer than
+# multi_question_below areas are covered, one turn asks about up to
+# questions_per_turn missing areas at once.
+GATHERING_CONFIG = {
+    "completion_threshold": int(os.getenv("PRD_COMPLETION_THRESHOLD", "7")),
+    "max_turns": int(os.getenv("PRD_MAX_GATHERING_TURNS", "6")),
+    "multi_question_below": int(os.getenv("PRD_MULTI_QUESTION_BELOW", "5")),
+    "questions_per_turn": int(os.getenv("PRD_QUESTIONS_PER_TURN", "3")),
+}
+
+# Speculative work while the user is typing an answer (see workflow.py).
+# Once min_coverage of the eight requirement areas are covered, a PRD draft is
+# generated in the background and reused if the answer that completes the
+# requirements adds nothing new (at most max_reuse_words, no new area), or
+# patched section by section if it only fills areas with a section of their own.
+SPECULATION_CONFIG = {
+    "enabled": os.getenv("PRD_SPECULATE", "0") == "1",
+    # One area short of completion by default
+    "min_coverage": int(os.getenv("PRD_SPECULATE_MIN_COVERAGE",
+                                  str(GATHERING_CONFIG["completion_threshold"] - 1))),
+    "max_reuse_words": int(os.getenv("PRD_SPECULATE_MAX_REUSE_WORDS", "6")),
+}
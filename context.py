@@ -0,0 +1,112 @@
+from config import CONTEXT_CONFIG
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) without loading a tokenizer"""
+    return max(1, len(text) // 4) if text else 0
+
+def extractive_summary(role: str, content: str, max_chars: int) -> str:
+    """Summarize a turn by keeping its first line, truncated"""
+    first_line = content.strip().split("\n", 1)[0]
+    if len(first_line) > max_chars:
+        first_line = first_line[:max_chars].rstrip() + "..."
+    return f"- {role}: {first_line}"
+
+class ConversationContext:
+    """Incrementally rendered conversation history bounded by a token budget.
+
+    Turns are appended to a rendered buffer as they arrive. When the buffer
+    exceeds the budget, the oldest turns are folded into a running summary so
+    prompt size stays flat instead of growing with the session.
+    """
+
+    HEADER = "Conversation history:\n"
+
+    def __init__(self, config: dict = CONTEXT_CONFIG, summarizer=None):
+        self.budget = int(config["context_window"] * config["history_fraction"])
+        self.summary_chars = config["summary_chars_per_turn"]
+        self.cost_per_1k = config["cost_per_1k_tokens"]
+        self.summarizer = summarizer or extractive_summary
+
+        self._recent = []          # (role, content, line, tokens) kept verbatim
+        self._recent_tokens = 0
+        self._summary = []         # summary lines for rolled-up turns
+        self._summary_tokens = 0
+        self._dropped = 0          # turns too old to keep even in the summary
+        self._pinned = None        # summary of the opening turn, never dropped
+        self._rendered = None
+
+        self.turns = 0
+        self.full_history_tokens = 0
+        self.prompt_tokens = []    # prompt tokens of each model call built from this context
+
+    def add(self, role: str, content) -> None:
+        """Append a turn, rolling the oldest turns into the summary if over budget"""
+        content = str(content)
+        line = f"{role}: {content}\n"
+        tokens = estimate_tokens(line)
+
+        self._recent.append((role, content, line, tokens))
+        self._recent_tokens += tokens
+        self.full_history_tokens += tokens
+        self.turns += 1
+
+        # Keep at least the latest turn verbatim even if it alone exceeds the budget
+        while len(self._recent) > 1 and self._recent_tokens + self._summary_tokens > self.budget:
+            old_role, old_content, _, old_tokens = self._recent.pop(0)
+            self._recent_tokens -= old_tokens
+            summary_line = self.summarizer(old_role, old_content, self.summary_chars) + "\n"
+            self._summary_tokens += estimate_tokens(summary_line)
+            self._rendered = None
+            if self._pinned is None:
+                # The opening turn usually names the product; keep it in every prompt
+                self._pinned = summary_line
+                continue
+            self._summary.append(summary_line)
+            
+            # The summary gets at most half the budget; the oldest lines go first
+            while self._summary and self._summary_tokens > self.budget // 2:
+                self._summary_tokens -= estimate_tokens(self._summary.pop(0))
+                self._dropped += 1
+
+        if self._rendered is not None:
+            self._rendered += line
+
+    def render(self) -> str:
+        """Rendered history; rebuilt only after a summary rollover"""
+        if self._rendered is None:
+            parts = [self.HEADER]
+            if self._pinned:
+                parts.append("Summary of earlier turns:\n")
+                parts.append(self._pinned)
+                if self._dropped:
+                    parts.append(f"- ({self._dropped} earlier turns omitted)\n")
+                parts.extend(self._summary)
+                parts.append("Recent turns:\n")
+            parts.extend(line for _, _, line, _ in self._recent)
+            self._rendered = "".join(parts)
+        return self._rendered
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens of the rendered history"""
+        return self._recent_tokens + self._summary_tokens
+
+    def record_prompt(self, prompt: str) -> int:
+        """Track the size of a prompt built from this context"""
+        tokens = estimate_tokens(prompt)
+        self.prompt_tokens.append(tokens)
+        return tokens
+
+    def stats(self) -> dict:
+        """Token usage, cost and savings versus resending the full transcript"""
+        total_prompt = sum(self.prompt_tokens)
+        return {
+            "turns": self.turns,
+            "summarized_turns": len(self._summary) + self._dropped + (1 if self._pinned else 0),
+            "context_tokens": self.tokens,
+            "full_history_tokens": self.full_history_tokens,
+            "saved_tokens": self.full_history_tokens - self.tokens,
+            "last_prompt_tokens": self.prompt_tokens[-1] if self.prompt_tokens else 0,
+            "total_prompt_tokens": total_prompt,
+            "estimated_cost": total_prompt / 1000 * self.cost_per_1k,
+        }
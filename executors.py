@@ -0,0 +1,48 @@
+from concurrent.futures import Future
+import queue
+import threading
+
+class DaemonThreadPool:
+    """Bounded thread pool whose workers are daemon threads.
+
+    ThreadPoolExecutor joins its workers at interpreter exit, so a model call
+    left running by an abandoned turn (a batch item that timed out) could hold
+    the process open for the whole request timeout. These workers are simply
+    dropped at exit instead. Supports the submit/map subset the workflow uses.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "pool"):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._work = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        self._work.put((future, fn, args, kwargs))
+        # Start a worker unless one is idle, as ThreadPoolExecutor does
+        if not self._idle.acquire(timeout=0):
+            with self._lock:
+                if len(self._threads) < self.max_workers:
+                    thread = threading.Thread(target=self._worker, daemon=True,
+                                              name=f"{self.thread_name_prefix}_{len(self._threads)}")
+                    self._threads.append(thread)
+                    thread.start()
+        return future
+
+    def map(self, fn, *iterables) -> list:
+        """Results of fn over the iterables, in order; raises the first error"""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def _worker(self) -> None:
+        while True:
+            future, fn, args, kwargs = self._work.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            self._idle.release()
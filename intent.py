@@ -0,0 +1,49 @@
+from config import INTENT_CONFIG
+import math
+import re
+
+# Labelled examples shared by the intent_classifier system prompt and the benchmark
+INTENT_EXAMPLES = [
+    ("I want to build a mobile app", "prd"),
+    ("UPI integration into payments bank", "prd"),
+    ("Create user stories for authentication", "prd"),
+    ("Hello, how are you?", "other"),
+    ("What can you do?", "other"),
+]
+
+# Weighted phrases; positive weights point to "prd", negative to "other"
+_SIGNALS = [
+    (r"\bprd\b|\brequirements?\b|\buser stor(y|ies)\b|\bspec(ification)?s?\b", 2.0),
+    (r"\b(build|building|create|creating|develop|developing|design|designing|launch|launching)\b", 2.0),
+    (r"\b(integrat\w*|implement\w*|automat\w*|migrat\w*)\b", 2.0),
+    (r"\b(app|apps|application|platform|feature|features|product|mvp)\b", 2.0),
+    (r"\b(system|tool|service|website|portal|dashboard|api|sdk|bot|marketplace|saas)\b", 1.0),
+    (r"\b(mobile|web|payments?|bank\w*|checkout|authentication|login|users?|customers?)\b", 1.0),
+    (r"\b(hello|hi|hey|greetings|good (morning|afternoon|evening))\b", -2.5),
+    (r"\bhow are you\b|\bthank(s| you)\b|\bbye\b", -2.5),
+    (r"\bwhat can you do\b|\bwho are you\b|\bwhat are you\b|\bhelp me understand\b", -2.5),
+    (r"\b(weather|joke|news|time is it)\b", -2.0),
+]
+_COMPILED = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in _SIGNALS]
+
+def score_intent(text: str) -> float:
+    """Probability that text asks for a PRD, from weighted keyword matches"""
+    score = sum(weight for pattern, weight in _COMPILED if pattern.search(text))
+    if score == 0:
+        return 0.5
+    return 1 / (1 + math.exp(-score))
+
+def pre_classify(text: str, config: dict = INTENT_CONFIG) -> tuple:
+    """Classify without an LLM call.
+
+    Returns (label, confidence). label is None when neither threshold is met
+    and the caller should fall back to the intent_classifier agent.
+    """
+    p_prd = score_intent(text)
+    if not config["enabled"]:
+        return None, p_prd
+    if p_prd >= config["prd_threshold"]:
+        return "prd", p_prd
+    if 1 - p_prd >= config["other_threshold"]:
+        return "other", 1 - p_prd
+    return None, max(p_prd, 1 - p_prd)
@@ -0,0 +1,380 @@
+from typing import TYPE_CHECKING, AsyncIterator, Iterator
+from cache import cache_for, agent_cache_key
+from singleflight import flight_for
+from config import LLM_POOL_CONFIG, PROMPT_CACHE_CONFIG, ADMISSION_CONFIG, llm_config_for
+from scheduler import AdmissionController, Overloaded
+from metrics import registry, record_call
+from context import estimate_tokens
+from router import router_for
+from collections import deque
+from contextlib import contextmanager
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+_clients = {}
+_async_clients = {}
+_limiters = {}
+_recent_prompts = {}  # base_url -> prompts the server probably still has cached
+_pinned = {}          # base_url -> when keep_alive was last refreshed
+_prompt_cache_lock = threading.Lock()
+_limiters_lock = threading.Lock()
+
+# Session that sync calls made through agent.generate_reply are queued under (see session_scope)
+_session = contextvars.ContextVar("prd_session", default="default")
+
+# Characters of the first user message that, with the system message, identify a prompt prefix
+PREFIX_KEY_CHARS = 512
+
+# openai and httpx are imported on first use: together they cost ~0.5s at startup
+if TYPE_CHECKING:
+    import openai
+
+def retryable_errors() -> tuple:
+    """Errors that mean "this endpoint, right now" and are worth retrying on another one"""
+    import openai
+    return (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)
+
+def _client_for(config: dict) -> "openai.OpenAI":
+    """Reuse one OpenAI-compatible client per endpoint; the router does the retrying"""
+    key = (config["base_url"], config.get("api_key"))
+    if key not in _clients:
+        import openai
+        _clients[key] = openai.OpenAI(base_url=config["base_url"], api_key=config.get("api_key"),
+                                      max_retries=0)
+    return _clients[key]
+
+def chat_messages(agent, messages: list) -> list:
+    """Prepend the agent's system message to the request messages"""
+    return [{"role": "system", "content": agent.system_message}] + list(messages)
+
+def prefix_key(prompt: list) -> str:
+    """Router affinity key: the system message plus the start of the first user message"""
+    first_user = next((str(m.get("content", "")) for m in prompt if m["role"] == "user"), "")
+    head = f"{prompt[0].get('content', '')}\0{first_user[:PREFIX_KEY_CHARS]}"
+    return hashlib.sha1(head.encode("utf-8")).hexdigest()
+
+def _record_prefix_reuse(agent_name: str, config: dict, prompt: list) -> None:
+    """Count prompt tokens the server can take from its KV cache instead of evaluating.
+
+    Approximates the server's cache slots with its last few prompts; a new
+    prompt reuses the longest prefix it shares with one of them.
+    """
+    text = "".join(f"{m['role']}\n{m.get('content', '')}\n" for m in prompt)
+    with _prompt_cache_lock:
+        slots = _recent_prompts.setdefault(config["base_url"], deque(maxlen=PROMPT_CACHE_CONFIG["slots"]))
+        shared = [len(os.path.commonprefix([text, cached])) for cached in slots]
+        reused = max(shared, default=0)
+        if reused:
+            del slots[shared.index(reused)]  # that slot now holds the new prompt
+        slots.append(text)
+    registry.inc("prd_prompt_tokens_reused_total", estimate_tokens(text[:reused]), agent=agent_name)
+
+def keep_warm(config: dict) -> None:
+    """Re-pin the endpoint's model with Ollama's keep_alive, at most once per refresh_seconds.
+
+    Chat completions may reset the unload timer to the server default, so the
+    model (and its KV cache) could be dropped while the user types an answer.
+    """
+    keep_alive = (config.get("extra_body") or {}).get("keep_alive")
+    if not keep_alive:
+        return
+    now = time.monotonic()
+    with _prompt_cache_lock:
+        if now - _pinned.get(config["base_url"], float("-inf")) < PROMPT_CACHE_CONFIG["refresh_seconds"]:
+            return
+        _pinned[config["base_url"]] = now
+    threading.Thread(target=_pin_model, args=(config, keep_alive), daemon=True, name="keep-alive").start()
+
+def _pin_model(config: dict, keep_alive: str) -> None:
+    import httpx
+
+    root = config["base_url"].rstrip("/")
+    root = root[:-3] if root.endswith("/v1") else root
+    try:
+        # A generate request without a prompt only loads the model and sets its keep_alive
+        httpx.post(f"{root}/api/generate", json={"model": config["model"], "keep_alive": keep_alive},
+                   timeout=LLM_POOL_CONFIG["timeout_seconds"])
+    except httpx.HTTPError as e:
+        logging.warning(f"Could not refresh keep_alive on {root}: {e}")
+
+@contextmanager
+def session_scope(session: str):
+    """Queue sync model calls made inside the block under this session for admission"""
+    token = _session.set(session)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+def complete(agent, messages: list, session: str = None) -> str:
+    """Non-streaming reply routed across the agent's endpoints, failing over on errors"""
+    session = session or _session.get()
+    router = router_for(agent.llm_config["config_list"])
+    prompt = chat_messages(agent, messages)
+    key = prefix_key(prompt)
+    priority, deadline = priority_for(agent.name), _deadline()
+    tried = []
+    while True:
+        endpoint = router.begin(tried, key)
+        config = endpoint.config
+        started = time.perf_counter()
+        try:
+            with limiter_for(config).slot(priority, session, deadline):
+                started = time.perf_counter()
+                response = _client_for(config).chat.completions.create(
+                    model=config["model"],
+                    messages=prompt,
+                    extra_body=config.get("extra_body")
+                )
+        except Overloaded as e:
+            router.end(endpoint, time.perf_counter() - started)
+            tried.append(endpoint)
+            if len(tried) == len(router.endpoints):
+                raise
+            logging.warning(f"{agent.name} call not admitted on {endpoint.name} ({e}); trying another endpoint")
+            continue
+        except retryable_errors() as e:
+            router.end(endpoint, time.perf_counter() - started, ok=False)
+            tried.append(endpoint)
+            if len(tried) == len(router.endpoints):
+                raise
+            logging.warning(f"{agent.name} call to {endpoint.name} failed ({e}); trying another endpoint")
+            continue
+        except BaseException:
+            router.end(endpoint, time.perf_counter() - started)
+            raise
+        router.end(endpoint, time.perf_counter() - started, ok=True)
+        _record_prefix_reuse(agent.name, config, prompt)
+        keep_warm(config)
+        return response.choices[0].message.content or ""
+
+def stream_reply(agent, messages: list, session: str = None) -> Iterator[str]:
+    """Stream completion tokens for an agent as they arrive from the model.
+    
+    Routed like complete(); a failed endpoint is only retried elsewhere
+    before the first token, so callers never see a reply restart.
+    """
+    started = time.perf_counter()
+    prompt = chat_messages(agent, messages)
+    cache = cache_for(agent.name)
+    key = agent_cache_key(agent, messages) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logging.info(f"{agent.name} reply served from cache")
+            record_call(agent.name, "stream", started, prompt, cached, outcome="cache_hit")
+            yield cached
+            return
+    
+    router = router_for(agent.llm_config["config_list"])
+    priority, deadline = priority_for(agent.name), _deadline()
+    session = session or _session.get()
+    tried = []
+    chunks = []
+    first_token = None
+
+    while True:
+        endpoint = router.begin(tried, prefix_key(prompt))
+        config = endpoint.config
+        sent = time.perf_counter()
+        try:
+            with limiter_for(config).slot(priority, session, deadline):
+                sent = time.perf_counter()
+                response = _client_for(config).chat.completions.create(
+                    model=config["model"],
+                    messages=prompt,
+                    stream=True,
+                    extra_body=config.get("extra_body")
+                )
+
+                for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if not token:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                        logging.info(f"{agent.name} first token after {first_token:.2f}s")
+                    chunks.append(token)
+                    yield token
+        except Overloaded as e:
+            router.end(endpoint, time.perf_counter() - sent)
+            tried.append(endpoint)
+            if len(tried) == len(router.endpoints):
+                record_call(agent.name, "stream", started, prompt, outcome="error")
+                raise
+            logging.warning(f"{agent.name} stream not admitted on {endpoint.name} ({e}); trying another endpoint")
+            continue
+        except retryable_errors() as e:
+            router.end(endpoint, time.perf_counter() - sent, ok=False)
+            tried.append(endpoint)
+            if chunks or len(tried) == len(router.endpoints):
+                record_call(agent.name, "stream", started, prompt, outcome="error", ttft=first_token)
+                raise
+            logging.warning(f"{agent.name} stream from {endpoint.name} failed ({e}); trying another endpoint")
+            continue
+        except BaseException as e:
+            router.end(endpoint, time.perf_counter() - sent)
+            if isinstance(e, Exception):
+                record_call(agent.name, "stream", started, prompt, outcome="error", ttft=first_token)
+            raise
+        router.end(endpoint, time.perf_counter() - sent, ok=True)
+        _record_prefix_reuse(agent.name, config, prompt)
+        keep_warm(config)
+        break
+    
+    reply = "".join(chunks)
+    record_call(agent.name, "stream", started, prompt, reply, ttft=first_token)
+    if cache:
+        cache.set(key, reply)
+
+    logging.info(f"{agent.name} stream finished after {time.perf_counter() - started:.2f}s")
+
+
+def _async_client_for(config: dict) -> "openai.AsyncOpenAI":
+    """Shared async client per endpoint over one pooled HTTP connection pool"""
+    key = (config["base_url"], config.get("api_key"))
+    if key not in _async_clients:
+        import httpx
+        import openai
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_POOL_CONFIG["max_connections"],
+                max_keepalive_connections=LLM_POOL_CONFIG["max_connections"]
+            ),
+            timeout=LLM_POOL_CONFIG["timeout_seconds"]
+        )
+        _async_clients[key] = openai.AsyncOpenAI(
+            base_url=config["base_url"], api_key=config.get("api_key"), http_client=http_client,
+            max_retries=0
+        )
+    return _async_clients[key]
+
+def limiter_for(config: dict) -> AdmissionController:
+    """Per-endpoint admission control shared by every session, sync or async"""
+    base_url = config["base_url"]
+    with _limiters_lock:
+        if base_url not in _limiters:
+            _limiters[base_url] = AdmissionController(LLM_POOL_CONFIG["max_concurrency"],
+                                                      ADMISSION_CONFIG["max_queue"], name=base_url)
+        return _limiters[base_url]
+
+def priority_for(agent_name: str) -> int:
+    """Admission priority of an agent's calls; lower is served first"""
+    return ADMISSION_CONFIG["priorities"].get(agent_name, ADMISSION_CONFIG["default_priority"])
+
+def _deadline() -> float:
+    return time.monotonic() + ADMISSION_CONFIG["max_wait_seconds"]
+
+def admission_retry_after(role: str):
+    """Seconds to wait before retrying if every endpoint of a role has a full queue for it, else None"""
+    priority = priority_for(role)
+    limiters = [limiter_for(config) for config in llm_config_for(role)["config_list"]]
+    if all(limiter.saturated(priority) for limiter in limiters):
+        return min(limiter.retry_after(priority) for limiter in limiters)
+    return None
+
+async def astream_reply(agent, messages: list, session: str = "default") -> AsyncIterator[str]:
+    """Async stream_reply over the shared pool, holding an endpoint slot while streaming.
+    
+    Wall time in the metrics includes waiting for a slot; TTFT is measured from
+    when the request is actually sent.
+    """
+    started = time.perf_counter()
+    prompt = chat_messages(agent, messages)
+    cache = cache_for(agent.name)
+    key = agent_cache_key(agent, messages) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logging.info(f"{agent.name} reply served from cache")
+            record_call(agent.name, "async", started, prompt, cached, outcome="cache_hit")
+            yield cached
+            return
+    
+    router = router_for(agent.llm_config["config_list"])
+    priority, deadline = priority_for(agent.name), _deadline()
+    tried = []
+    chunks = []
+    first_token = None
+    
+    while True:
+        # Counted as outstanding while queued for a slot, so busy endpoints are avoided
+        endpoint = router.begin(tried, prefix_key(prompt))
+        config = endpoint.config
+        queued = time.perf_counter()
+        try:
+            async with limiter_for(config).aslot(priority, session, deadline):
+                sent = time.perf_counter()
+                response = await _async_client_for(config).chat.completions.create(
+                    model=config["model"],
+                    messages=prompt,
+                    stream=True,
+                    extra_body=config.get("extra_body")
+                )
+                async for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if not token:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - sent
+                        logging.info(f"{agent.name} first token after {first_token:.2f}s")
+                    chunks.append(token)
+                    yield token
+        except Overloaded as e:
+            router.end(endpoint, time.perf_counter() - queued)
+            tried.append(endpoint)
+            if len(tried) == len(router.endpoints):
+                record_call(agent.name, "async", started, prompt, outcome="error")
+                raise
+            logging.warning(f"{agent.name} stream not admitted on {endpoint.name} ({e}); trying another endpoint")
+            continue
+        except retryable_errors() as e:
+            router.end(endpoint, time.perf_counter() - queued, ok=False)
+            tried.append(endpoint)
+            if chunks or len(tried) == len(router.endpoints):
+                record_call(agent.name, "async", started, prompt, outcome="error", ttft=first_token)
+                raise
+            logging.warning(f"{agent.name} stream from {endpoint.name} failed ({e}); trying another endpoint")
+            continue
+        except BaseException as e:
+            router.end(endpoint, time.perf_counter() - queued)
+            if isinstance(e, Exception):
+                record_call(agent.name, "async", started, prompt, outcome="error", ttft=first_token)
+            raise
+        router.end(endpoint, time.perf_counter() - sent, ok=True)
+        _record_prefix_reuse(agent.name, config, prompt)
+        keep_warm(config)
+        break
+    
+    reply = "".join(chunks)
+    record_call(agent.name, "async", started, prompt, reply, ttft=first_token)
+    if cache:
+        cache.set(key, reply)
+
+async def areply(agent, messages: list, session: str = "default") -> str:
+    """Async non-streaming reply over the shared pool, joining an identical call in flight if opted in"""
+    flight = flight_for(agent.name)
+    if flight is None:
+        return await _areply(agent, messages, session)
+    started = time.perf_counter()
+    reply, shared = await flight.ado(agent_cache_key(agent, messages), lambda: _areply(agent, messages, session))
+    if shared:
+        logging.info(f"{agent.name} reply shared with an identical call in flight")
+        record_call(agent.name, "async", started, chat_messages(agent, messages), reply, outcome="coalesced")
+    return reply
+
+async def _areply(agent, messages: list, session: str) -> str:
+    chunks = []
+    async for token in astream_reply(agent, messages, session):
+        chunks.append(token)
+    return "".join(chunks)
@@ -1,13 +1,78 @@
 #!/usr/bin/env python3
 """
 AutoGen PRD Generator - Simple Entry Point
+
+Interactive:  python main.py
+Batch:        python main.py --batch ideas.jsonl --output prds/ --workers 8
+Startup:      python main.py --import-profile
 """
 
-from workflow import generate_prd
+# Only the standard library is imported up front; the workflow, agents and
+# model clients load when a mode first needs them
+import argparse
 import logging
+import time
+_started = time.perf_counter()
 logging.basicConfig(level=logging.INFO)
 
-def main():
+# Import order for --import-profile: project modules, then the heavy
+# dependencies that are only loaded by the first model call
+PROFILED_IMPORTS = [
+    ("config", "project"), ("workflow", "project"), ("batch", "project"),
+    ("httpx", "first model call"), ("openai", "first model call"), ("autogen", "first agent"),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AutoGen PRD Generator")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="generate PRDs for every idea in a .jsonl/.csv file ('-' for stdin)")
+    parser.add_argument("--output", default="prds",
+                        help="batch output directory, or a .jsonl file (default: prds)")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent batch workers (default: 4)")
+    parser.add_argument("--timeout", type=float, default=900,
+                        help="per-idea timeout in seconds (default: 900)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip ideas already completed in the output checkpoint")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write model and stage metrics (Prometheus text format) on exit")
+    parser.add_argument("--import-profile", action="store_true",
+                        help="report how long startup and each deferred import take, then exit")
+    return parser.parse_args()
+
+def profile_imports():
+    """Print startup time and the cost of each import, in the order they load"""
+    import importlib
+    
+    print(f"{'main.py ready':<22} {(time.perf_counter() - _started) * 1000:8.1f} ms")
+    total = 0.0
+    for name, when in PROFILED_IMPORTS:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        elapsed = (time.perf_counter() - started) * 1000
+        total += elapsed
+        print(f"{'import ' + name:<22} {elapsed:8.1f} ms  ({when})")
+    print(f"{'all imports':<22} {total:8.1f} ms")
+
+def write_metrics(path: str):
+    from metrics import render
+    
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(render())
+    logging.info(f"📈 Metrics written to {path}")
+
+def run_batch_mode(args):
+    from batch import read_ideas, run_batch
+    
+    ideas = read_ideas(args.batch)
+    logging.info(f"📚 Batch of {len(ideas)} ideas → {args.output} ({args.workers} workers)")
+    counts = run_batch(ideas, args.output, workers=args.workers,
+                       timeout=args.timeout, resume=args.resume)
+    logging.info(f"✅ Batch finished: {counts}")
+
+def run_interactive():
+    """Prompt for product ideas and stream each PRD to the terminal"""
+    from workflow import stream_prd
+    
     logging.info("🤖 AutoGen PRD Generator")
     logging.info("Using Ollama + Qwen3:8b locally")
     logging.info("=" * 50)
@@ -24,15 +89,37 @@ def main():
             
         logging.info("\n🔄 Generating PRD...")
         try:
-            prd = generate_prd(user_input)
-            logging.info("\n📋 Generated PRD:")
-            logging.info("=" * 50)
-            logging.info(prd)
-            logging.info("=" * 50)
+            for event in stream_prd(user_input):
+                if event["event"] == "stage":
+                    logging.info(f"▶️ Stage: {event['stage']}")
+                elif event["event"] == "token":
+                    print(event["content"], end="", flush=True)
+                elif event["event"] == "result":
+                    result = event["result"]
+                    print()
+                    if result["stage"] == "complete":
+                        timings = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in result["timings"].items())
+                        logging.info(f"\n📋 PRD generated ({timings})")
+                    else:
+                        logging.info(f"\n❌ {result['error']}")
             
         except Exception as e:
             logging.info(f"❌ Error: {e}")
             logging.info("Make sure Ollama is running: ollama serve")
 
+def main():
+    args = parse_args()
+    if args.import_profile:
+        profile_imports()
+        return
+    try:
+        if args.batch:
+            run_batch_mode(args)
+        else:
+            run_interactive()
+    finally:
+        if args.metrics:
+            write_metrics(args.metrics)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
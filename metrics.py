@@ -0,0 +1,165 @@
+from context import estimate_tokens
+import threading
+import time
+
+# Histogram buckets in seconds, from a cached reply up to a long PRD generation
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HELP = {
+    "prd_model_calls_total": ("counter", "Model calls by agent, call mode and outcome: ok, error, cache_hit or coalesced"),
+    "prd_model_call_seconds": ("histogram", "Wall time of model calls"),
+    "prd_model_ttft_seconds": ("histogram", "Time to first streamed token"),
+    "prd_model_prompt_tokens_total": ("counter", "Estimated prompt tokens sent"),
+    "prd_model_completion_tokens_total": ("counter", "Estimated completion tokens received"),
+    "prd_stage_seconds": ("histogram", "Time spent in each workflow stage per turn"),
+    "prd_router_calls_total": ("counter", "Routed model calls by endpoint and outcome"),
+    "prd_speculation_started_total": ("counter", "Speculative drafts started while the user was typing"),
+    "prd_speculation_total": ("counter", "Speculative drafts by outcome: hit, patched, miss, unused or error"),
+    "prd_speculation_seconds": ("histogram", "Background time spent on speculative drafts"),
+    "prd_router_health_checks_total": ("counter", "Endpoint health probes by outcome"),
+    "prd_gathering_completed_total": ("counter", "Finished requirements gatherings by reason: covered, threshold, turn_cap or agent"),
+    "prd_gathering_turns": ("histogram", "User messages per finished requirements gathering"),
+    "prd_admission_queue_depth": ("gauge", "Model calls waiting for an endpoint slot, by priority"),
+    "prd_admission_active": ("gauge", "Model calls holding an endpoint slot"),
+    "prd_admission_wait_seconds": ("histogram", "Time model calls waited for an endpoint slot, by priority"),
+    "prd_admission_rejected_total": ("counter", "Model calls rejected by admission control: queue_full or deadline"),
+    "prd_prompt_tokens_reused_total": ("counter", "Estimated prompt tokens a server could take from its KV cache"),
+}
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by metric name and labels"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+    @staticmethod
+    def _labels(labels: dict) -> tuple:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> dict:
+        """Counters, gauges and histogram sums/counts as (name, labels, value) lists, for display"""
+        with self._lock:
+            return {
+                "counters": [(n, dict(l), v) for (n, l), v in self._counters.items()],
+                "gauges": [(n, dict(l), v) for (n, l), v in self._gauges.items()],
+                "histograms": [(n, dict(l), {"sum": s[-2], "count": s[-1]})
+                               for (n, l), s in self._histograms.items()],
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((k, list(v)) for k, v in self._histograms.items())
+
+        lines, described = [], set()
+
+        def describe(name):
+            if name not in described and name in HELP:
+                kind, text = HELP[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        for (name, labels), value in counters + gauges:
+            describe(name)
+            lines.append(f"{name}{label_text(labels)} {value}")
+        for (name, labels), series in histograms:
+            describe(name)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{name}_bucket{label_text(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{label_text(labels)} {series[-2]:.6f}")
+            lines.append(f"{name}_count{label_text(labels)} {series[-1]}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+def record_call(agent: str, mode: str, started: float, messages: list, reply=None,
+                outcome: str = "ok", ttft: float = None) -> None:
+    """Record one model call; started is a time.perf_counter() value"""
+    registry.inc("prd_model_calls_total", agent=agent, mode=mode, outcome=outcome)
+    registry.observe("prd_model_call_seconds", time.perf_counter() - started, agent=agent, mode=mode)
+    if ttft is not None:
+        registry.observe("prd_model_ttft_seconds", ttft, agent=agent)
+    if outcome == "ok":
+        prompt = sum(estimate_tokens(str(m.get("content", ""))) for m in messages or [])
+        registry.inc("prd_model_prompt_tokens_total", prompt, agent=agent)
+        registry.inc("prd_model_completion_tokens_total", estimate_tokens(str(reply or "")), agent=agent)
+
+def agent_summary() -> dict:
+    """Per-agent calls, errors, cache hits, coalesced calls and total model seconds, for the UI"""
+    snapshot = registry.snapshot()
+    summary = {}
+    for name, labels, value in snapshot["counters"]:
+        if name != "prd_model_calls_total":
+            continue
+        row = summary.setdefault(labels["agent"], {"calls": 0, "errors": 0, "cache_hits": 0, "coalesced": 0,
+                                                   "seconds": 0.0})
+        row["calls"] += value
+        if labels["outcome"] == "error":
+            row["errors"] += value
+        elif labels["outcome"] == "cache_hit":
+            row["cache_hits"] += value
+        elif labels["outcome"] == "coalesced":
+            row["coalesced"] += value
+    for name, labels, series in snapshot["histograms"]:
+        if name == "prd_model_call_seconds" and labels["agent"] in summary:
+            summary[labels["agent"]]["seconds"] += series["sum"]
+    return summary
+
+def gathering_summary() -> dict:
+    """PRDs gathered so far, with mean user turns and model calls per PRD"""
+    snapshot = registry.snapshot()
+    prds = sum(v for n, _, v in snapshot["counters"] if n == "prd_gathering_completed_total")
+    calls = sum(v for n, l, v in snapshot["counters"]
+                if n == "prd_model_calls_total" and l["outcome"] not in ("cache_hit", "coalesced"))
+    turns = sum(s["sum"] for n, _, s in snapshot["histograms"] if n == "prd_gathering_turns")
+    return {
+        "prds": prds,
+        "turns_per_prd": turns / prds if prds else 0.0,
+        "model_calls_per_prd": calls / prds if prds else 0.0,
+    }
+
+def render() -> str:
+    """Process-wide metrics in the Prometheus text format"""
+    return registry.render()
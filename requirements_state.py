@@ -0,0 +1,180 @@
+import re
+
+# The eight areas the conversation agent is told to gather, with word stems
+# that show an answer touched on each one
+REQUIREMENT_AREAS = {
+    "product_purpose": ("build", "app", "platform", "tool", "product", "problem", "purpose", "solve", "idea"),
+    "target_users": ("user", "customer", "owner", "persona", "audience", "people", "team", "admin", "buyer"),
+    "functional": ("feature", "must", "able", "allow", "support", "book", "track", "search", "manage",
+                   "notif", "review", "upload"),
+    "technical": ("ios", "android", "web", "mobile", "cloud", "database", "performance", "security",
+                  "scal", "backend", "offline", "latency", "stack"),
+    "integration": ("integrat", "stripe", "api", "connect", "sync", "payment", "sso", "webhook"),
+    "timeline_scope": ("month", "week", "launch", "deadline", "timeline", "mvp", "phase", "quarter",
+                       "scope", "release"),
+    "success_metrics": ("success", "metric", "kpi", "measure", "retention", "conversion", "completed", "nps"),
+    "business_context": ("business", "revenue", "commission", "pricing", "price", "market", "budget",
+                         "monetiz", "competitor", "subscription", "cost"),
+}
+
+def area_scores(text: str) -> dict:
+    """Number of words in the text matching each requirement area's stems"""
+    words = re.findall(r"[a-z0-9]+", str(text).lower())
+    scores = {}
+    for area, stems in REQUIREMENT_AREAS.items():
+        hits = sum(1 for word in words if word.startswith(stems))
+        if hits:
+            scores[area] = hits
+    return scores
+
+def covered_areas(text: str) -> set:
+    """Requirement areas whose stems appear in the text"""
+    return set(area_scores(text))
+
+def adds_information(answer: str, covered: set, max_words: int) -> bool:
+    """Whether an answer could change a document drafted from the areas already covered.
+
+    Long answers always count; short ones count only if they touch a new area.
+    """
+    if len(str(answer).split()) > max_words:
+        return True
+    return bool(covered_areas(answer) - covered)
+
+# Slot headings, in the order the conversation agent's prompt lists the areas
+AREA_LABELS = {
+    "product_purpose": "Product/Feature Name & Core Purpose",
+    "target_users": "Target Users & User Personas",
+    "functional": "Functional Requirements",
+    "technical": "Technical Requirements & Constraints",
+    "integration": "Integration Requirements",
+    "timeline_scope": "Timeline & Project Scope",
+    "success_metrics": "Success Metrics & KPIs",
+    "business_context": "Business Context & Goals",
+}
+
+_SENTENCE = re.compile(r"(?<=[.!?;])\s+|\n+")
+# "Label: details" lines, allowing list markers and bold labels
+_LABELED = re.compile(r"^[-*#\d.\s]*\**(?P<label>[^:*]+?)\**\s*:\s*\**(?P<text>.+)$")
+_CLAUSE = re.compile(r",\s+")
+
+class RequirementsState:
+    """What the user has said so far, sorted into the eight requirement areas.
+
+    Updated locally after every user turn: each sentence goes to the area it
+    mentions, or to the area the last question asked about. Whether gathering
+    is done follows from coverage and the number of answers, so no model call
+    is needed to decide it.
+    """
+
+    def __init__(self):
+        self.slots = {area: [] for area in REQUIREMENT_AREAS}
+        self.touched = set()   # areas mentioned in passing; informational, never counted as covered
+        self.asking = None     # area the latest question targets
+        self.turns = 0         # user messages filed so far
+
+    @property
+    def covered(self) -> set:
+        """Areas with at least one note filed under them; a passing mention is not enough"""
+        return {area for area, notes in self.slots.items() if notes}
+
+    @property
+    def missing(self) -> list:
+        return [area for area in REQUIREMENT_AREAS if area not in self.covered]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+    def completion(self, threshold: int, max_turns: int = 0):
+        """Why gathering can stop ("covered", "threshold" or "turn_cap"), or None to keep asking"""
+        if self.complete:
+            return "covered"
+        if len(self.covered) >= threshold:
+            return "threshold"
+        if max_turns and self.turns >= max_turns:
+            return "turn_cap"
+        return None
+
+    def ask(self, question: str) -> None:
+        """Note which missing area a question is about (the first, if several), to file the answer under"""
+        missing = self.missing
+        mentioned = [area for area in missing if area in covered_areas(question)]
+        self.asking = (mentioned or missing or [None])[0]
+
+    def _primary(self, scores: dict):
+        """Best-matching area; ties go to the area being asked about, then prompt order"""
+        order = list(REQUIREMENT_AREAS)
+        return max(scores, key=lambda a: (scores[a], a == self.asking, -order.index(a)))
+
+    def _notes(self, sentence: str) -> list:
+        """(area, text) pairs for a sentence, split at commas when it spans several areas"""
+        scores = area_scores(sentence)
+        if len(scores) < 2:
+            return [(self._primary(scores) if scores else None, sentence)]
+        notes = []
+        for clause in _CLAUSE.split(sentence):
+            clause_scores = area_scores(clause)
+            area = self._primary(clause_scores) if clause_scores else None
+            if notes and area in (None, notes[-1][0]):
+                # Keep runs of the same area (and area-less clauses) together
+                notes[-1] = (notes[-1][0], f"{notes[-1][1]}, {clause}")
+            else:
+                notes.append((area, clause))
+        return notes
+
+    def update(self, answer: str) -> set:
+        """File an answer's sentences under their areas; returns the areas it added"""
+        before = self.covered
+        self.turns += 1
+        for sentence in filter(None, (part.strip() for part in _SENTENCE.split(str(answer)))):
+            scores = area_scores(sentence)
+            for area, note in self._notes(sentence):
+                if area is None:
+                    if not self.asking and self.covered:
+                        continue  # nothing asked and nothing recognisable, e.g. "that's all"
+                    area = self.asking or "product_purpose"
+                if note not in self.slots[area]:
+                    self.slots[area].append(note)
+            self.touched |= set(scores)
+        return self.covered - before
+
+    def fill(self, text: str) -> set:
+        """File "Label: details" lines, e.g. an extraction reply, under their areas; returns the areas it added"""
+        before = self.covered
+        labels = {label.lower(): area for area, label in AREA_LABELS.items()}
+        for line in str(text).splitlines():
+            match = _LABELED.match(line.strip())
+            if not match:
+                continue
+            given = match.group("label").strip().lower()
+            # Models often shorten the label ("Target Users"), so a prefix is enough
+            area = next((area for label, area in labels.items() if len(given) >= 4 and label.startswith(given)),
+                        None)
+            note = match.group("text").strip()
+            if area and note not in self.slots[area]:
+                self.slots[area].append(note)
+        return self.covered - before
+
+    def render(self) -> str:
+        """Compact requirements summary used in place of the raw transcript"""
+        lines = []
+        for area, label in AREA_LABELS.items():
+            if self.slots[area]:
+                lines.append(f"{label}:")
+                lines.extend(f"- {note}" for note in self.slots[area])
+        if self.missing:
+            lines.append("Not yet discussed: " + ", ".join(AREA_LABELS[area] for area in self.missing))
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {"slots": self.slots, "touched": sorted(self.touched), "asking": self.asking,
+                "turns": self.turns}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RequirementsState":
+        state = cls()
+        state.slots.update({area: list(notes) for area, notes in data.get("slots", {}).items()})
+        state.touched = set(data.get("touched", []))
+        state.asking = data.get("asking")
+        state.turns = data.get("turns", 0)
+        return state
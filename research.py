@@ -0,0 +1,167 @@
+from config import RESEARCH_CONFIG
+from cache import ResponseCache
+from executors import DaemonThreadPool
+import hashlib
+import json
+import logging
+import re
+import threading
+
+logging.basicConfig(level=logging.INFO)
+
+# Sub-queries fanned out for each product idea
+SUB_QUERIES = [
+    "{topic} market size and trends",
+    "{topic} competitors and alternatives",
+    "{topic} technical standards and best practices",
+]
+
+class DuckDuckGoBackend:
+    """Web search through duckduckgo_search, reusing one client per thread"""
+
+    name = "duckduckgo"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def search(self, query: str, max_results: int) -> list:
+        if not hasattr(self._local, "client"):
+            from duckduckgo_search import DDGS
+            self._local.client = DDGS()
+        return list(self._local.client.text(query, max_results=max_results))
+
+class FixtureBackend:
+    """Offline backend serving canned results from a JSON file or dict.
+
+    The fixture maps normalized queries (or any substring of one) to lists of
+    {"title", "body", "href"} results.
+    """
+
+    name = "fixture"
+
+    def __init__(self, fixture):
+        if isinstance(fixture, str):
+            with open(fixture, encoding="utf-8") as f:
+                fixture = json.load(f)
+        self.fixture = {normalize_query(k): v for k, v in fixture.items()}
+
+    def search(self, query: str, max_results: int) -> list:
+        query = normalize_query(query)
+        if query in self.fixture:
+            return self.fixture[query][:max_results]
+        for key, results in self.fixture.items():
+            if key in query:
+                return results[:max_results]
+        return []
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+_backend = None
+_search_cache = None
+_search_pool = None
+_lock = threading.Lock()
+
+def get_backend():
+    """Configured search backend, created once per process"""
+    global _backend
+    with _lock:
+        if _backend is None:
+            if RESEARCH_CONFIG["backend"] == "fixture":
+                _backend = FixtureBackend(RESEARCH_CONFIG["fixture_path"])
+            else:
+                _backend = DuckDuckGoBackend()
+    return _backend
+
+def set_backend(backend) -> None:
+    """Swap the search backend (e.g. a FixtureBackend for offline runs)"""
+    global _backend
+    with _lock:
+        _backend = backend
+
+def get_search_cache() -> ResponseCache:
+    global _search_cache
+    with _lock:
+        if _search_cache is None:
+            _search_cache = ResponseCache(RESEARCH_CONFIG["cache_path"],
+                                          ttl_seconds=RESEARCH_CONFIG["cache_ttl_seconds"])
+    return _search_cache
+
+def get_search_pool() -> DaemonThreadPool:
+    """Long-lived pool for sub-queries, so each worker keeps its backend client between calls"""
+    global _search_pool
+    with _lock:
+        if _search_pool is None:
+            _search_pool = DaemonThreadPool(max_workers=len(SUB_QUERIES), thread_name_prefix="search")
+    return _search_pool
+
+def search(query: str, max_results: int = None, backend=None) -> list:
+    """Search with an on-disk TTL cache keyed by backend and normalized query"""
+    backend = backend or get_backend()
+    max_results = max_results or RESEARCH_CONFIG["max_results"]
+    key_source = f"{backend.name}|{max_results}|{normalize_query(query)}"
+    key = "search:" + hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    cache = get_search_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    results = [
+        {"title": r.get("title", ""), "body": r.get("body", ""), "href": r.get("href", "")}
+        for r in backend.search(query, max_results)
+    ]
+    cache.set(key, json.dumps(results))
+    return results
+
+def _shingles(text: str) -> set:
+    words = normalize_query(text).split()
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def dedupe(results: list, threshold: float = None) -> list:
+    """Drop results whose URL repeats or whose snippet overlaps an earlier one"""
+    threshold = RESEARCH_CONFIG["dedupe_threshold"] if threshold is None else threshold
+    kept, seen_urls, kept_shingles = [], set(), []
+    for result in results:
+        if result["href"] and result["href"] in seen_urls:
+            continue
+        shingles = _shingles(result["title"] + " " + result["body"])
+        if any(len(shingles & other) / len(shingles | other) >= threshold
+               for other in kept_shingles if shingles | other):
+            continue
+        seen_urls.add(result["href"])
+        kept_shingles.append(shingles)
+        kept.append(result)
+    return kept
+
+def gather_research(topic: str, backend=None) -> str:
+    """Run the sub-queries concurrently and format deduplicated findings for a prompt.
+
+    Returns "" when web search is disabled or every query fails, so the
+    research agent falls back to its own knowledge.
+    """
+    if not RESEARCH_CONFIG["web_search"]:
+        return ""
+
+    queries = [template.format(topic=topic) for template in SUB_QUERIES]
+
+    def run(query):
+        try:
+            return [dict(r, query=query) for r in search(query, backend=backend)]
+        except Exception as e:
+            logging.warning(f"Search failed for '{query}': {e}")
+            return []
+
+    batches = get_search_pool().map(run, queries)
+
+    raw = [result for batch in batches for result in batch]
+    results = dedupe(raw)
+    logging.info(f"Web research: {len(raw)} results, {len(results)} after dedupe")
+    if not results:
+        return ""
+
+    lines = []
+    for i, result in enumerate(results, 1):
+        lines.append(f"{i}. {result['title']} ({result['href']})\n   {result['body']}")
+    return "\n".join(lines)
@@ -0,0 +1,166 @@
+from config import ROUTER_CONFIG
+from metrics import registry
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+# Prompt prefixes remembered for endpoint affinity
+AFFINITY_ENTRIES = 4096
+
+logging.basicConfig(level=logging.INFO)
+
+class NoEndpointAvailable(RuntimeError):
+    """Every endpoint of a route has been tried for this call"""
+
+class Endpoint:
+    """One model server in a route, with its load and circuit breaker state"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.outstanding = 0
+        self.latency = None       # moving average of call seconds
+        self.failures = 0         # consecutive failures
+        self.open_until = 0.0     # circuit open (skipped) until this time
+        self.trial = False        # a half-open trial call is in flight
+
+    @property
+    def name(self) -> str:
+        return self.config["base_url"]
+
+    def available(self, now: float) -> bool:
+        """Closed circuit, or half-open with no trial call running yet"""
+        return now >= self.open_until and not self.trial
+
+class Router:
+    """Spreads one role's calls across its endpoints and fails over between them.
+
+    Picks the endpoint with the fewest outstanding calls (or, with the
+    "latency" strategy, the lowest outstanding x recent latency). An endpoint
+    whose calls fail failure_threshold times in a row is skipped for
+    cooldown_seconds, then gets a single trial call before taking traffic again.
+    A background health check probes every endpoint so a recovered server is
+    put back without waiting for the cooldown.
+
+    Calls given an affinity key (a prompt prefix) go back to the endpoint that
+    served that key last, where the prefix is still in the KV cache, unless it
+    is busier than the best choice by more than affinity_slack calls.
+    """
+
+    def __init__(self, config_list: list, config: dict = ROUTER_CONFIG):
+        self.endpoints = [Endpoint(entry) for entry in config_list]
+        self.strategy = config["strategy"]
+        self.failure_threshold = config["failure_threshold"]
+        self.cooldown = config["cooldown_seconds"]
+        self.health_timeout = config["health_timeout_seconds"]
+        self.affinity_slack = config["affinity_slack"]
+        self._affinity = OrderedDict()  # key -> endpoint that served it last
+        self._lock = threading.Lock()
+        self._turn = 0
+        if len(self.endpoints) > 1 and config["health_interval_seconds"] > 0:
+            threading.Thread(target=self._health_loop, args=(config["health_interval_seconds"],),
+                             daemon=True, name="router-health").start()
+
+    def _score(self, endpoint: Endpoint):
+        if self.strategy == "latency":
+            # Unmeasured endpoints score 0 so each gets tried once
+            return (endpoint.outstanding + 1) * (endpoint.latency or 0.0)
+        return (endpoint.outstanding, endpoint.latency or 0.0)
+
+    def begin(self, exclude: list = (), key: str = None) -> Endpoint:
+        """Choose an endpoint for a call and count it as outstanding"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                raise NoEndpointAvailable(f"all {len(self.endpoints)} endpoints failed")
+            ready = [e for e in candidates if e.available(now)]
+            if ready:
+                # Rotate the starting point so ties spread across endpoints
+                self._turn += 1
+                offset = self._turn % len(ready)
+                endpoint = min(ready[offset:] + ready[:offset], key=self._score)
+                if key is not None and self.affinity_slack >= 0:
+                    endpoint = self._sticky(key, endpoint, ready)
+            else:
+                # Every circuit is open: probe the one closest to recovery rather than fail
+                endpoint = min(candidates, key=lambda e: e.open_until)
+            if endpoint.failures >= self.failure_threshold:
+                endpoint.trial = True
+            endpoint.outstanding += 1
+        return endpoint
+
+    def _sticky(self, key: str, best: Endpoint, ready: list) -> Endpoint:
+        """The endpoint that last served key if it is not too busy, else best; called under the lock"""
+        pinned = self._affinity.get(key)
+        if pinned in ready and pinned.outstanding <= best.outstanding + self.affinity_slack:
+            best = pinned
+        self._affinity[key] = best
+        self._affinity.move_to_end(key)
+        if len(self._affinity) > AFFINITY_ENTRIES:
+            self._affinity.popitem(last=False)
+        return best
+
+    def end(self, endpoint: Endpoint, seconds: float, ok: bool = None) -> None:
+        """Finish a call; ok=None means the outcome says nothing about the endpoint"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.trial = False
+            if ok:
+                endpoint.failures = 0
+                endpoint.open_until = 0.0
+                endpoint.latency = seconds if endpoint.latency is None else 0.7 * endpoint.latency + 0.3 * seconds
+            elif ok is False:
+                endpoint.failures += 1
+                if endpoint.failures >= self.failure_threshold:
+                    endpoint.open_until = time.monotonic() + self.cooldown
+                    logging.warning(f"Endpoint {endpoint.name} failed {endpoint.failures} times; "
+                                    f"skipping it for {self.cooldown:.0f}s")
+        outcome = "ok" if ok else "error" if ok is False else "other"
+        registry.inc("prd_router_calls_total", endpoint=endpoint.name, outcome=outcome)
+
+    def check_health(self) -> None:
+        """Probe every endpoint's model list; close or open circuits to match"""
+        import httpx
+
+        for endpoint in self.endpoints:
+            try:
+                healthy = httpx.get(endpoint.name.rstrip("/") + "/models",
+                                    timeout=self.health_timeout).status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            with self._lock:
+                if healthy and endpoint.open_until:
+                    logging.info(f"Endpoint {endpoint.name} is healthy again")
+                    endpoint.failures = 0
+                    endpoint.open_until = 0.0
+                elif not healthy:
+                    endpoint.failures = max(endpoint.failures, self.failure_threshold)
+                    endpoint.open_until = time.monotonic() + self.cooldown
+            registry.inc("prd_router_health_checks_total", endpoint=endpoint.name,
+                         outcome="ok" if healthy else "error")
+
+    def _health_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                logging.warning(f"Endpoint health check failed: {e}")
+
+    def stats(self) -> list:
+        with self._lock:
+            return [{"endpoint": e.name, "outstanding": e.outstanding, "latency": e.latency,
+                     "failures": e.failures, "open": e.open_until > time.monotonic()}
+                    for e in self.endpoints]
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+def router_for(config_list: list) -> Router:
+    """Shared router for a config_list, keyed by its endpoints and models"""
+    key = tuple((entry["base_url"], entry["model"]) for entry in config_list)
+    with _routers_lock:
+        if key not in _routers:
+            _routers[key] = Router(config_list)
+        return _routers[key]
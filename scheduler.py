@@ -0,0 +1,214 @@
+from metrics import registry
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import threading
+import time
+
+class Overloaded(RuntimeError):
+    """A model call was not admitted: its queue is full or it would miss its deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    """A queued call; wake() is called once it has been handed a slot"""
+
+    def __init__(self, wake, priority: int, queued: float):
+        self.wake = wake
+        self.priority = priority
+        self.queued = queued
+        self.admitted = False
+
+class AdmissionController:
+    """Per-endpoint concurrency limit with a bounded queue per priority.
+
+    Lower priority numbers are served first. Within a priority, free slots go
+    to sessions round-robin rather than to the oldest waiter overall, so one
+    session issuing many calls cannot starve the others. A call is rejected
+    with Overloaded, instead of waiting on the socket, when its priority's
+    queue is full or it cannot get a slot before its deadline. Works for
+    threads and asyncio tasks alike, sharing the same slots.
+    """
+
+    def __init__(self, limit: int, max_queue: int, name: str = ""):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.name = name
+        self.active = 0
+        self._lock = threading.Lock()
+        self._queues = {}          # priority -> OrderedDict of session -> deque of waiters
+        self._hold_seconds = 1.0   # moving average of how long a slot is held
+
+    @property
+    def waiting(self) -> int:
+        with self._lock:
+            return self._waiting()
+
+    def _waiting(self) -> int:
+        """waiting with self._lock already held"""
+        return sum(self._depth(priority) for priority in self._queues)
+
+    def _depth(self, priority: int) -> int:
+        return sum(len(queue) for queue in self._queues.get(priority, {}).values())
+
+    def retry_after(self, priority: int) -> float:
+        """Rough seconds until a new call at this priority would get a slot"""
+        with self._lock:
+            return self._retry_after(priority)
+
+    def _retry_after(self, priority: int) -> float:
+        """retry_after with self._lock already held"""
+        ahead = sum(self._depth(p) for p in self._queues if p <= priority)
+        return round((ahead + 1) * self._hold_seconds / max(1, self.limit), 1)
+
+    def saturated(self, priority: int) -> bool:
+        """Whether a call at this priority would be rejected for a full queue right now"""
+        with self._lock:
+            return self.active >= self.limit and self._depth(priority) >= self.max_queue
+
+    def _publish(self) -> None:
+        registry.set("prd_admission_active", self.active, endpoint=self.name)
+        for priority in self._queues:
+            registry.set("prd_admission_queue_depth", self._depth(priority),
+                         endpoint=self.name, priority=priority)
+
+    def _reject(self, priority: int, reason: str) -> Overloaded:
+        registry.inc("prd_admission_rejected_total", endpoint=self.name, priority=priority, reason=reason)
+        retry_after = self._retry_after(priority)
+        return Overloaded(f"{self.name or 'endpoint'} is saturated ({reason}); retry in {retry_after}s",
+                          retry_after)
+
+    def _enqueue(self, priority: int, session: str, deadline: float, wake):
+        """Take a free slot (None) or queue a waiter; raises Overloaded if it cannot be served in time"""
+        now = time.monotonic()
+        with self._lock:
+            if self.active < self.limit and not self._waiting():
+                self.active += 1
+                self._publish()
+                return None
+            if self._depth(priority) >= self.max_queue:
+                raise self._reject(priority, "queue_full")
+            if deadline is not None and now + self._retry_after(priority) > deadline:
+                raise self._reject(priority, "deadline")
+            waiter = _Waiter(wake, priority, now)
+            self._queues.setdefault(priority, OrderedDict()).setdefault(session, deque()).append(waiter)
+            self._publish()
+            return waiter
+
+    def _remove(self, waiter: _Waiter) -> None:
+        sessions = self._queues[waiter.priority]
+        for session, queue in sessions.items():
+            if waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del sessions[session]
+                break
+        self._publish()
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Take a waiter out of its queue; False if it was handed a slot first"""
+        with self._lock:
+            if waiter.admitted:
+                return False
+            self._remove(waiter)
+            return True
+
+    def _expire(self, waiter: _Waiter):
+        """Withdraw a waiter past its deadline and return its Overloaded; None if it was handed a slot first"""
+        with self._lock:
+            if waiter.admitted:
+                return None
+            self._remove(waiter)
+            return self._reject(waiter.priority, "deadline")
+
+    def _next(self):
+        """Pop the next waiter: best priority first, sessions in rotation within it"""
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session, queue = next(iter(sessions.items()))
+            waiter = queue.popleft()
+            if queue:
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            return waiter
+        return None
+
+    def _admitted(self, waiter: _Waiter) -> None:
+        registry.observe("prd_admission_wait_seconds", time.monotonic() - waiter.queued, priority=waiter.priority)
+
+    def release(self, held: float = None) -> None:
+        """Free a slot, handing it straight to the next waiter if there is one"""
+        with self._lock:
+            if held is not None:
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held
+            waiter = self._next()
+            if waiter is None:
+                self.active -= 1
+            else:
+                # Transfer the slot directly; active count is unchanged
+                waiter.admitted = True
+            self._publish()
+        if waiter is not None:
+            waiter.wake()
+
+    def acquire(self, priority: int = 0, session: str = "default", deadline: float = None) -> None:
+        """Block until a slot is free; deadline is a time.monotonic() value"""
+        event = threading.Event()
+        waiter = self._enqueue(priority, session, deadline, event.set)
+        if waiter is None:
+            return
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not event.wait(timeout):
+            rejected = self._expire(waiter)
+            if rejected is not None:
+                raise rejected
+        self._admitted(waiter)
+
+    async def aacquire(self, priority: int = 0, session: str = "default", deadline: float = None) -> None:
+        """Async acquire; the event loop keeps running while the call waits"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(priority, session, deadline, wake)
+        if waiter is None:
+            return
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            rejected = self._expire(waiter)
+            if rejected is not None:
+                raise rejected
+            # Handed a slot just as the deadline passed; use it
+        except asyncio.CancelledError:
+            if not self._withdraw(waiter):
+                # Slot was handed over just as we were cancelled; pass it on
+                self.release()
+            raise
+        self._admitted(waiter)
+
+    @contextmanager
+    def slot(self, priority: int = 0, session: str = "default", deadline: float = None):
+        self.acquire(priority, session, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = 0, session: str = "default", deadline: float = None):
+        await self.aacquire(priority, session, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
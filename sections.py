@@ -0,0 +1,177 @@
+import re
+
+_HEADING = re.compile(r"^##\s+(\d+)\.\s+(.+?)\s*$")
+
+class Section:
+    """One numbered PRD section and the points it should cover"""
+
+    def __init__(self, number: int, title: str, points: list):
+        self.number = number
+        self.title = title
+        self.points = points
+
+    @property
+    def heading(self) -> str:
+        return f"## {self.number}. {self.title}"
+
+    def __repr__(self):
+        return f"Section({self.number}, {self.title!r})"
+
+def parse_sections(template: str) -> list:
+    """Read the numbered "## N. Title" sections and their bullets from a PRD template.
+
+    Used on the prd_agent system message so the sectioned generator always
+    follows whatever sections that prompt asks for.
+    """
+    sections, current = [], None
+    for line in template.splitlines():
+        match = _HEADING.match(line.strip())
+        if match:
+            current = Section(int(match.group(1)), match.group(2), [])
+            sections.append(current)
+        elif current is not None and line.strip().startswith("- "):
+            current.points.append(line.strip()[2:].strip())
+        elif current is not None and not line.strip():
+            continue
+        elif current is not None:
+            current = None
+    return sections
+
+def requirements_digest(requirements: str, research: str) -> str:
+    """Shared input for every section request, and so the prefix they share"""
+    return f"""RESEARCH FINDINGS:
+{research}
+
+REQUIREMENTS:
+{requirements}"""
+
+def section_prompt(section: Section, digest: str) -> str:
+    """Prompt for drafting a single section"""
+    points = "\n".join(f"- {point}" for point in section.points)
+    return f"""{digest}
+
+Write ONLY section "{section.heading}" of the PRD for the product above.
+Cover:
+{points}
+
+Start with the heading line "{section.heading}" and do not write any other section."""
+
+def summary_prompt(section: Section, digest: str, drafts: list) -> str:
+    """Prompt for the executive summary, written last from the drafted sections"""
+    outline = "\n".join(
+        f"{draft.splitlines()[0]}: {' '.join(draft.splitlines()[1:3])[:300]}"
+        for draft in drafts if draft.strip()
+    )
+    points = "\n".join(f"- {point}" for point in section.points)
+    return f"""{digest}
+
+DRAFTED SECTIONS (outline):
+{outline}
+
+Write ONLY section "{section.heading}" of the PRD, consistent with the drafted sections.
+Cover:
+{points}
+
+Start with the heading line "{section.heading}" and do not write any other section."""
+
+def clean_section(section: Section, text) -> str:
+    """Consistency pass for one draft: exact heading, no stray document title or other sections"""
+    lines = str(text).strip().splitlines()
+
+    # Drop a leading document title and any heading the model wrote for this section
+    while lines and (lines[0].startswith("# ") or not lines[0].strip()):
+        lines.pop(0)
+    if lines and _HEADING.match(lines[0].strip()):
+        lines.pop(0)
+
+    # Cut anything after the model starts a different numbered section
+    for index, line in enumerate(lines):
+        match = _HEADING.match(line.strip())
+        if match and int(match.group(1)) != section.number:
+            lines = lines[:index]
+            break
+
+    body = "\n".join(lines).strip()
+    return f"{section.heading}\n{body}" if body else section.heading
+
+def assemble(sections: list, drafts: dict) -> str:
+    """Join cleaned section drafts in template order"""
+    parts = [clean_section(section, drafts.get(section.number, "")) for section in sections]
+    return "\n\n".join(parts)
+
+def split_prd(prd: str, template: str = "") -> tuple:
+    """Split a generated PRD into (preamble, [(Section, text), ...]).
+
+    Each text runs from its heading up to the next numbered heading, trailing
+    whitespace included, so joining the preamble and texts gives back the
+    original document exactly. Sections pick up their points from the template.
+    """
+    points = {section.number: section.points for section in parse_sections(template)}
+    preamble, parts = "", []
+    for line in str(prd).splitlines(keepends=True):
+        match = _HEADING.match(line.strip())
+        if match:
+            number = int(match.group(1))
+            parts.append([Section(number, match.group(2), points.get(number, [])), line])
+        elif parts:
+            parts[-1][1] += line
+        else:
+            preamble += line
+    return preamble, [(section, text) for section, text in parts]
+
+def replace_section(prd: str, number: int, text: str) -> str:
+    """Swap one section's text into the PRD, leaving every other byte as it was"""
+    preamble, parts = split_prd(prd)
+    joined = [preamble]
+    for section, old in parts:
+        if section.number == number:
+            trailing = old[len(old.rstrip()):] or "\n\n"
+            joined.append(text.strip() + trailing)
+        else:
+            joined.append(old)
+    return "".join(joined)
+
+# Words that appear in too many section titles to say which one is meant
+_GENERIC_WORDS = {"requirements", "requirement", "product", "section", "user", "users", "the", "and"}
+_SECTION_NUMBER = re.compile(r"(?:section|§|#)\s*(\d+)", re.IGNORECASE)
+
+def _words(text: str) -> set:
+    return {word.rstrip("s") for word in re.findall(r"[a-z]+", text.lower())
+            if len(word) > 2 and word not in _GENERIC_WORDS}
+
+def find_section(sections: list, request: str):
+    """The section a refinement request refers to, or None if it is unclear.
+
+    An explicit "section N" wins; otherwise sections are scored on words shared
+    with their title (weighted) and with the points they cover.
+    """
+    match = _SECTION_NUMBER.search(request)
+    if match:
+        return next((s for s in sections if s.number == int(match.group(1))), None)
+
+    words = _words(request)
+    scores = []
+    for section in sections:
+        score = 3 * len(words & _words(section.title)) + len(words & _words(" ".join(section.points)))
+        scores.append((score, section))
+    scores.sort(key=lambda pair: pair[0], reverse=True)
+    if not scores or scores[0][0] == 0 or (len(scores) > 1 and scores[0][0] == scores[1][0]):
+        return None
+    return scores[0][1]
+
+def refine_prompt(section: Section, current: str, outline: list, request: str) -> str:
+    """Prompt for rewriting one section; the rest of the PRD is given only as headings"""
+    cover = "It should cover:\n" + "\n".join(f"- {point}" for point in section.points) + "\n" \
+        if section.points else ""
+    headings = "\n".join(outline)
+    return f"""The PRD has these sections:
+{headings}
+
+CURRENT SECTION:
+{current.strip()}
+
+CHANGE REQUESTED:
+{request}
+
+Rewrite ONLY section "{section.heading}" applying the requested change. Keep what is still correct.
+{cover}Start with the heading line "{section.heading}" and do not write any other section."""
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+HTTP API for the PRD workflow (ASGI, Server-Sent Events for streaming)
+Run with: python server.py --port 8000
+          uvicorn server:app --workers 1
+"""
+
+from async_workflow import AsyncPRDWorkflow
+from session_store import get_store
+from config import SERVER_CONFIG
+from llm import admission_retry_after
+from metrics import render as render_metrics
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from collections import OrderedDict
+import argparse
+import asyncio
+import json
+import logging
+import math
+
+logging.basicConfig(level=logging.INFO)
+
+class SessionCache:
+    """Bounded LRU of live workflows in front of the session store.
+
+    The store already holds every message and the session state, so an
+    evicted workflow is simply resumed from it on its next request. Sessions
+    with a turn in flight are never evicted.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._workflows = OrderedDict()  # session_id -> AsyncPRDWorkflow
+        self._locks = {}                 # session_id -> asyncio.Lock, one turn at a time
+
+    def __len__(self):
+        return len(self._workflows)
+
+    def ids(self) -> list:
+        return list(reversed(self._workflows))
+
+    def create(self) -> AsyncPRDWorkflow:
+        workflow = AsyncPRDWorkflow()
+        if workflow.store:
+            # Listed from the start, not only after the first message
+            workflow.store.update(workflow.session_id, stage=workflow.stage)
+        self._add(workflow)
+        return workflow
+
+    def get(self, session_id: str):
+        """Live workflow for a session, resumed from the store if needed; None if unknown"""
+        workflow = self._workflows.get(session_id)
+        if workflow is not None:
+            self._workflows.move_to_end(session_id)
+            return workflow
+        workflow = AsyncPRDWorkflow.resume(session_id)
+        if workflow is not None:
+            self._add(workflow)
+        return workflow
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(session_id, asyncio.Lock())
+
+    def follow(self, session_id: str, workflow: AsyncPRDWorkflow) -> None:
+        """Re-key a workflow that moved to a new session during a turn ("new PRD").
+
+        The old ID is dropped from the cache, so it resumes the finished session from the store.
+        """
+        if workflow.session_id == session_id:
+            return
+        self._workflows.pop(session_id, None)
+        self._locks.pop(session_id, None)
+        self._add(workflow)
+
+    def _add(self, workflow: AsyncPRDWorkflow) -> None:
+        self._workflows[workflow.session_id] = workflow
+        for session_id in list(self._workflows):
+            if len(self._workflows) <= self.capacity:
+                break
+            if self._locks.get(session_id, asyncio.Lock()).locked():
+                continue
+            del self._workflows[session_id]
+            self._locks.pop(session_id, None)
+            if workflow.store is None:
+                logging.warning(f"Session {session_id} evicted without a session store; it is lost")
+
+sessions = SessionCache(SERVER_CONFIG["max_sessions"])
+
+# Agent whose queue decides whether a turn at this stage is admitted
+STAGE_ROLES = {
+    "initial": "conversation_agent",
+    "requirements_gathering": "conversation_agent",
+    "complete": "prd_agent",
+}
+
+def _json(data, status_code: int = 200) -> JSONResponse:
+    # Results may carry model reply objects; fall back to their text
+    return JSONResponse(json.loads(json.dumps(data, default=str)), status_code=status_code)
+
+def _not_found(session_id: str) -> JSONResponse:
+    return JSONResponse({"error": f"unknown session {session_id}"}, status_code=404)
+
+class _Finally:
+    """ASGI wrapper that runs a callback once the response is over, however it ended.
+
+    A streaming body's own finally never runs if the client is gone before
+    Starlette starts iterating it.
+    """
+
+    def __init__(self, response, callback):
+        self.response = response
+        self.callback = callback
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.callback()
+
+def _overloaded(retry_after: float, data: dict = None) -> JSONResponse:
+    """503 with Retry-After, for turns the model servers cannot take on right now"""
+    body = json.loads(json.dumps(data or {"error": "model servers are saturated"}, default=str))
+    body["retry_after"] = retry_after
+    return JSONResponse(body, status_code=503, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+def _sse(event: dict) -> str:
+    """One Server-Sent Event named after the workflow event type"""
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def create_session(request: Request):
+    workflow = sessions.create()
+    return _json({"session_id": workflow.session_id, "stage": workflow.stage}, status_code=201)
+
+async def list_sessions(request: Request):
+    limit = int(request.query_params.get("limit", 50))
+    store = get_store()
+    if store:
+        return _json({"sessions": store.list_sessions(limit)})
+    return _json({"sessions": [{"id": session_id} for session_id in sessions.ids()[:limit]]})
+
+async def get_session(request: Request):
+    session_id = request.path_params["session_id"]
+    workflow = sessions.get(session_id)
+    if workflow is None:
+        return _not_found(session_id)
+    return _json({
+        "session_id": session_id,
+        "stage": workflow.stage,
+        "messages": workflow.conversation_history,
+        "requirements": workflow.requirements.to_dict(),
+    })
+
+async def get_prd(request: Request):
+    session_id = request.path_params["session_id"]
+    workflow = sessions.get(session_id)
+    if workflow is None:
+        return _not_found(session_id)
+    if not workflow.prd:
+        return JSONResponse({"error": "no PRD yet", "stage": workflow.stage}, status_code=404)
+    if "text/markdown" in request.headers.get("accept", ""):
+        return PlainTextResponse(workflow.prd, media_type="text/markdown")
+    return _json({"session_id": session_id, "prd": workflow.prd})
+
+async def post_turn(request: Request):
+    """Run one turn; streamed as SSE when asked for with Accept or ?stream=1"""
+    session_id = request.path_params["session_id"]
+    workflow = sessions.get(session_id)
+    if workflow is None:
+        return _not_found(session_id)
+    try:
+        user_input = str((await request.json())["input"]).strip()
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse({"error": 'expected a JSON body like {"input": "..."}'}, status_code=400)
+    if not user_input:
+        return JSONResponse({"error": "input is empty"}, status_code=400)
+
+    lock = sessions.lock(session_id)
+    if lock.locked():
+        return JSONResponse({"error": "a turn is already running for this session"}, status_code=409)
+    # Reject before the turn touches the session if its model queue is already full
+    retry_after = admission_retry_after(STAGE_ROLES.get(workflow.stage, "conversation_agent"))
+    if retry_after is not None:
+        return _overloaded(retry_after)
+
+    stream = ("text/event-stream" in request.headers.get("accept", "")
+              or request.query_params.get("stream") in ("1", "true"))
+    if not stream:
+        async with lock:
+            result = await workflow.process_input(user_input)
+        sessions.follow(session_id, workflow)
+        if result.get("retry_after") is not None:
+            return _overloaded(result["retry_after"], result)
+        return _json(result)
+
+    # Taken now, not when the body starts streaming, so a second concurrent turn gets 409
+    await lock.acquire()
+
+    async def events():
+        async for event in workflow.stream_input(user_input):
+            yield _sse(event)
+
+    def done():
+        lock.release()
+        sessions.follow(session_id, workflow)
+
+    response = StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return _Finally(response, done)
+
+async def generate_prd(request: Request):
+    """One-shot PRD from a single idea, no questions; the session stays readable afterwards"""
+    try:
+        idea = str((await request.json())["input"]).strip()
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse({"error": 'expected a JSON body like {"input": "..."}'}, status_code=400)
+    if not idea:
+        return JSONResponse({"error": "input is empty"}, status_code=400)
+    retry_after = admission_retry_after("prd_agent")
+    if retry_after is not None:
+        return _overloaded(retry_after)
+
+    workflow = sessions.create()
+    async with sessions.lock(workflow.session_id):
+        result = await workflow.generate(idea)
+    if result["retry_after"] is not None:
+        return _overloaded(result["retry_after"], result)
+    return _json(result, status_code=200 if result["stage"] == "complete" else 502)
+
+async def health(request: Request):
+    return _json({"status": "ok", "live_sessions": len(sessions)})
+
+async def metrics(request: Request):
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+app = Starlette(routes=[
+    Route("/sessions", create_session, methods=["POST"]),
+    Route("/sessions", list_sessions, methods=["GET"]),
+    Route("/sessions/{session_id}", get_session, methods=["GET"]),
+    Route("/sessions/{session_id}/turns", post_turn, methods=["POST"]),
+    Route("/sessions/{session_id}/prd", get_prd, methods=["GET"]),
+    Route("/prd", generate_prd, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+])
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="PRD workflow HTTP API")
+    parser.add_argument("--host", default=SERVER_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=SERVER_CONFIG["port"])
+    args = parser.parse_args()
+    # One process: the live sessions and the shared model pool are per process
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
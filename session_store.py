@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Append-only session store backed by SQLite (WAL)
+Run with: python session_store.py list
+          python session_store.py prune --days 30
+"""
+
+from config import SESSION_CONFIG
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+class SessionStore:
+    """Persists each message as it happens, plus a small per-session state row.
+
+    Messages are only ever inserted, never rewritten, so a crash mid-session
+    loses at most the turn in flight. The one exception is a turn rejected by
+    admission control, whose messages are dropped again (truncate) so its
+    retry does not repeat them. Resuming is an indexed lookup by ID.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            created REAL NOT NULL,
+            updated REAL NOT NULL,
+            stage TEXT NOT NULL DEFAULT 'initial',
+            state TEXT NOT NULL DEFAULT '{}'
+        )""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created REAL NOT NULL
+        )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._db.commit()
+
+    def _touch(self, session_id: str, now: float):
+        self._db.execute(
+            "INSERT INTO sessions (id, created, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET updated = excluded.updated",
+            (session_id, now, now)
+        )
+
+    def append(self, session_id: str, role: str, content) -> None:
+        """Append one message to a session, creating the session if needed"""
+        now = time.time()
+        with self._lock:
+            self._touch(session_id, now)
+            self._db.execute(
+                "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                (session_id, role, str(content), now)
+            )
+            self._db.commit()
+
+    def update(self, session_id: str, stage: str = None, **state) -> None:
+        """Set the session stage and merge keys into its state"""
+        now = time.time()
+        with self._lock:
+            self._touch(session_id, now)
+            if stage is not None:
+                self._db.execute("UPDATE sessions SET stage = ? WHERE id = ?", (stage, session_id))
+            if state:
+                row = self._db.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                merged = json.loads(row[0])
+                merged.update(state)
+                self._db.execute("UPDATE sessions SET state = ? WHERE id = ?",
+                                 (json.dumps(merged, default=str), session_id))
+            self._db.commit()
+
+    def truncate(self, session_id: str, keep: int) -> None:
+        """Delete a session's messages after its first keep"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id LIMIT ?)",
+                (session_id, session_id, keep)
+            )
+            self._db.commit()
+
+    def load(self, session_id: str):
+        """Session with its messages, or None if unknown"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, created, updated, stage, state FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            messages = self._db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return {
+            "id": row[0],
+            "created": row[1],
+            "updated": row[2],
+            "stage": row[3],
+            "state": json.loads(row[4]),
+            "messages": [{"role": role, "content": content} for role, content in messages]
+        }
+
+    def list_sessions(self, limit: int = 50) -> list:
+        """Most recently updated sessions, without their messages"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT s.id, s.created, s.updated, s.stage, "
+                "(SELECT COUNT(*) FROM messages m WHERE m.session_id = s.id) "
+                "FROM sessions s ORDER BY s.updated DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            {"id": r[0], "created": r[1], "updated": r[2], "stage": r[3], "messages": r[4]}
+            for r in rows
+        ]
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete sessions not updated within the given age; returns how many"""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            stale = [r[0] for r in self._db.execute(
+                "SELECT id FROM sessions WHERE updated < ?", (cutoff,)
+            ).fetchall()]
+            self._db.executemany("DELETE FROM messages WHERE session_id = ?", [(s,) for s in stale])
+            self._db.executemany("DELETE FROM sessions WHERE id = ?", [(s,) for s in stale])
+            self._db.commit()
+        return len(stale)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Process-wide session store, or None when persistence is disabled"""
+    global _store
+    if not SESSION_CONFIG["enabled"]:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(SESSION_CONFIG["path"])
+            logging.info(f"Session store opened at {SESSION_CONFIG['path']}")
+    return _store
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage saved PRD sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="show recent sessions")
+    list_parser.add_argument("--limit", type=int, default=20)
+    prune_parser = commands.add_parser("prune", help="delete old sessions")
+    prune_parser.add_argument("--days", type=float, default=30)
+    args = parser.parse_args()
+
+    store = SessionStore(SESSION_CONFIG["path"])
+    if args.command == "list":
+        for session in store.list_sessions(args.limit):
+            updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(session["updated"]))
+            print(f"{session['id']}  {updated}  {session['stage']:<24} {session['messages']} messages")
+    elif args.command == "prune":
+        print(f"Pruned {store.prune(args.days * 24 * 3600)} sessions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from config import SINGLE_FLIGHT_CONFIG
+import asyncio
+import threading
+
+class _Call:
+    """One in-flight call and the result its waiters will share"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one.
+
+    The first caller for a key runs the call; callers with the same key that
+    arrive while it is in flight wait and get the same result (or exception).
+    Nothing is kept once the call returns; that is the response cache's job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call, for threads
+        self._tasks = {}  # (event loop, key) -> asyncio.Task
+
+    def do(self, key: str, fn) -> tuple:
+        """Run fn() once per key at a time; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    async def ado(self, key: str, factory) -> tuple:
+        """Await factory() once per key at a time within this event loop; returns (result, shared).
+
+        The call runs as its own task, so a waiter being cancelled does not
+        cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        shared = task is not None
+        if not shared:
+            task = self._tasks[task_key] = loop.create_task(factory())
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._tasks)
+
+_flight = SingleFlight()
+
+def flight_for(agent_name: str):
+    """Process-wide single-flight group for an agent that opted in via SINGLE_FLIGHT_CONFIG, else None"""
+    if not SINGLE_FLIGHT_CONFIG["enabled"] or agent_name not in SINGLE_FLIGHT_CONFIG["agents"]:
+        return None
+    return _flight
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Deterministic OpenAI-compatible stub server for offline load tests and benchmarks
+Run with: python stub_server.py --port 11435 --token-latency 0.01
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+import argparse
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+COMPLETE_REPLY = "REQUIREMENTS_COMPLETE - I have gathered sufficient information to create a detailed PRD."
+
+def scripted_reply(messages: list, complete_after: int = 3, complete_trigger: str = None,
+                   script: list = None) -> str:
+    """Canned reply chosen from the calling agent's system message.
+
+    script rules ({"agent": system message substring, "match": prompt regex,
+    "reply": text}, both keys optional) are tried first. The conversation agent
+    completes after complete_after answered turns, or as soon as a user turn
+    contains complete_trigger.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    prompt = messages[-1]["content"] if messages else ""
+
+    for rule in script or []:
+        if rule.get("agent", "") in system and re.search(rule.get("match", ""), prompt):
+            return rule["reply"]
+
+    if "Intent Classification" in system:
+        return "prd"
+    if "Requirements Specialist" in system:
+        answered = prompt.count("\nuser: ")
+        triggered = complete_trigger and complete_trigger.lower() in prompt.lower()
+        if answered >= complete_after or triggered:
+            return COMPLETE_REPLY
+        # Ask about the areas the workflow named, so a simulated user can answer them
+        asked = re.search(r"Ask about (.+?) (?:next|together)", prompt)
+        if asked:
+            return f"Question {answered + 1}: could you tell me about {asked.group(1)}?"
+        return f"Question {answered + 1}: who are the primary users and what problem does this solve for them?"
+    if "Requirements Analyst" in system:
+        return "\n".join(f"{label}: Assumed from the idea." for label in re.findall(r"^\d\. (.+)$", system, re.M))
+    if "Research Specialist" in system:
+        return "## Market Analysis\nGrowing demand.\n\n## Competitive Landscape\nThree incumbents.\n\n" \
+               "## Technical Considerations\nUse standard APIs.\n\n## User Insights\nUsers want speed.\n\n" \
+               "## Recommendations\nStart with an MVP."
+    if "Product Manager" in system:
+        requested = re.search(r'(?:Write|Rewrite) ONLY section "(## \d+\. [^"]+)"', prompt)
+        if requested:
+            return _section_text(requested.group(1), revised="CHANGE REQUESTED" in prompt)
+        return "\n\n".join(_section_text(heading) for heading in re.findall(r"^## \d+\. .+$", system, re.M))
+    return "OK"
+
+def make_reply_fn(complete_after: int = 3, complete_trigger: str = None, script=None):
+    """scripted_reply with fixed settings; script may be a rule list or a JSON file path"""
+    if isinstance(script, str):
+        with open(script, encoding="utf-8") as f:
+            script = json.load(f)
+    return functools.partial(scripted_reply, complete_after=complete_after,
+                             complete_trigger=complete_trigger, script=script)
+
+def _section_text(heading: str, revised: bool = False) -> str:
+    """Canned body for one PRD section, long enough to make generation time visible"""
+    lines = [heading] + (["- Revised: updated as requested."] if revised else [])
+    for i in range(1, 6):
+        lines.append(f"- Requirement {i}: the product must support this capability with clear acceptance "
+                     f"criteria, measurable targets and documented edge cases.")
+    return "\n".join(lines)
+
+def tokenize(text: str) -> list:
+    """Split text into word-sized chunks that keep their whitespace"""
+    tokens, current = [], ""
+    for char in text:
+        current += char
+        if char in " \n":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+class StubLLMServer:
+    """Background HTTP server speaking the OpenAI chat completions protocol.
+
+    reply_fn(messages) -> str picks each completion. Replies are streamed word
+    by word with token_latency seconds between chunks, after first_token_latency.
+    Prompt evaluation costs prompt_token_latency per token, except for a prefix
+    shared with one of the last kv_slots prompts, as with a server's KV cache.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, reply_fn=None,
+                 token_latency: float = 0.0, first_token_latency: float = 0.0,
+                 prompt_token_latency: float = 0.0, kv_slots: int = 4):
+        self.reply_fn = reply_fn or scripted_reply
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.prompt_tokens = 0
+        self.evaluated_tokens = 0
+        self.keep_alive_requests = 0
+        self._kv_slots = deque(maxlen=kv_slots) if kv_slots > 0 else None
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _prompt_eval_seconds(self, messages: list) -> float:
+        """Simulated prompt evaluation time, counting only tokens not in a cached prefix"""
+        text = "".join(f"{m.get('role')}\n{m.get('content', '')}\n" for m in messages)
+        with self._lock:
+            reused = 0
+            if self._kv_slots is not None:
+                shared = [len(os.path.commonprefix([text, cached])) for cached in self._kv_slots]
+                reused = max(shared, default=0)
+                if reused:
+                    del self._kv_slots[shared.index(reused)]
+                self._kv_slots.append(text)
+            evaluated = (len(text) - reused) // 4
+            self.prompt_tokens += len(text) // 4
+            self.evaluated_tokens += evaluated
+        return evaluated * self.prompt_token_latency
+
+    def _track(self, delta: int):
+        with self._lock:
+            self.active += delta
+            if delta > 0:
+                self.requests += 1
+                self.peak_active = max(self.peak_active, self.active)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if not self.path.rstrip("/").endswith("/models"):
+                    self.send_error(404)
+                    return
+                payload = json.dumps({"object": "list", "data": [{"id": "stub", "object": "model"}]}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if self.path.rstrip("/").endswith("/api/generate"):
+                    self._keep_alive()
+                    return
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                server._track(1)
+                try:
+                    time.sleep(server._prompt_eval_seconds(body.get("messages", [])))
+                    reply = server.reply_fn(body.get("messages", []))
+                    if body.get("stream"):
+                        self._stream(body, reply)
+                    else:
+                        self._complete(body, reply)
+                finally:
+                    server._track(-1)
+
+            def _keep_alive(self):
+                """Ollama's model load / keep_alive request: a generate call without a prompt"""
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.keep_alive_requests += 1
+                payload = json.dumps({"model": body.get("model", "stub"), "response": "",
+                                      "done": True, "done_reason": "load"}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _usage(self, body: dict, reply: str) -> dict:
+                prompt = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+                completion = len(reply) // 4
+                return {"prompt_tokens": prompt, "completion_tokens": completion,
+                        "total_tokens": prompt + completion}
+
+            def _complete(self, body: dict, reply: str):
+                time.sleep(server.first_token_latency + server.token_latency * len(tokenize(reply)))
+                payload = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": reply}}],
+                    "usage": self._usage(body, reply)
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body: dict, reply: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                time.sleep(server.first_token_latency)
+                for token in tokenize(reply):
+                    time.sleep(server.token_latency)
+                    self._event({"id": completion_id, "object": "chat.completion.chunk",
+                                 "created": int(time.time()), "model": body.get("model", "stub"),
+                                 "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                self._event({"id": completion_id, "object": "chat.completion.chunk",
+                             "created": int(time.time()), "model": body.get("model", "stub"),
+                             "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                             "usage": self._usage(body, reply)})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _event(self, data: dict):
+                self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.0)
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0,
+                        help="seconds per prompt token not covered by a cached prefix")
+    parser.add_argument("--complete-after", type=int, default=3,
+                        help="answered turns before the conversation agent says REQUIREMENTS_COMPLETE")
+    parser.add_argument("--complete-trigger", help="user phrase that completes requirements immediately")
+    parser.add_argument("--script", help="JSON file of scripted reply rules")
+    args = parser.parse_args()
+
+    reply_fn = make_reply_fn(args.complete_after, args.complete_trigger, args.script)
+    server = StubLLMServer(args.host, args.port, reply_fn=reply_fn, token_latency=args.token_latency,
+                           first_token_latency=args.first_token_latency,
+                           prompt_token_latency=args.prompt_token_latency)
+    print(f"Stub LLM server on {server.base_url}/v1 (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from scheduler import AdmissionController, Overloaded
+import asyncio
+import sys
+import threading
+import time
+import pytest
+
+async def _queue(controller, calls):
+    """Queue (name, priority, session) calls behind a held slot; returns admission order and tasks"""
+    order = []
+
+    async def call(name, priority, session):
+        await controller.aacquire(priority, session)
+        order.append(name)
+
+    tasks = []
+    for name, priority, session in calls:
+        tasks.append(asyncio.ensure_future(call(name, priority, session)))
+        await asyncio.sleep(0)
+    return order, tasks
+
+async def _drain(controller, tasks):
+    """Release the held slot once per queued call, letting each one in turn"""
+    for _ in tasks:
+        controller.release()
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+
+def test_free_slot_is_taken_at_once():
+    controller = AdmissionController(limit=2, max_queue=4)
+    controller.acquire()
+    controller.acquire()
+    assert controller.active == 2 and controller.waiting == 0
+    controller.release()
+    controller.release()
+    assert controller.active == 0
+
+def test_lower_priority_number_goes_first():
+    async def run():
+        controller = AdmissionController(limit=1, max_queue=4)
+        await controller.aacquire()
+        order, tasks = await _queue(controller, [("prd", 2, "a"), ("extract", 1, "b"), ("chat", 0, "c")])
+        await _drain(controller, tasks)
+        return order
+
+    assert asyncio.run(run()) == ["chat", "extract", "prd"]
+
+def test_sessions_take_turns_within_a_priority():
+    async def run():
+        controller = AdmissionController(limit=1, max_queue=8)
+        await controller.aacquire()
+        order, tasks = await _queue(controller, [("a1", 0, "a"), ("a2", 0, "a"), ("a3", 0, "a"), ("b1", 0, "b")])
+        await _drain(controller, tasks)
+        return order
+
+    assert asyncio.run(run()) == ["a1", "b1", "a2", "a3"]
+
+def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController(limit=1, max_queue=1)
+    controller.acquire()
+    waiter = threading.Thread(target=controller.acquire)
+    waiter.start()
+    while not controller.waiting:
+        time.sleep(0.001)
+
+    with pytest.raises(Overloaded) as rejected:
+        controller.acquire()
+    assert rejected.value.retry_after > 0
+    # Another priority has its own queue
+    assert controller.saturated(0) and not controller.saturated(1)
+
+    controller.release()
+    waiter.join(1)
+    assert not waiter.is_alive() and controller.active == 1
+
+def test_call_that_would_miss_its_deadline_is_rejected():
+    controller = AdmissionController(limit=1, max_queue=4)
+    controller.acquire()
+    with pytest.raises(Overloaded):
+        controller.acquire(deadline=time.monotonic() + 0.01)
+    assert controller.waiting == 0 and controller.active == 1
+
+def test_waiter_past_its_deadline_is_withdrawn():
+    controller = AdmissionController(limit=1, max_queue=4)
+    controller._hold_seconds = 0.01
+    controller.acquire()
+    with pytest.raises(Overloaded):
+        controller.acquire(deadline=time.monotonic() + 0.05)
+    assert controller.waiting == 0
+    controller.release()
+    assert controller.active == 0
+
+def test_cancelled_async_waiter_gives_up_its_place():
+    async def run():
+        controller = AdmissionController(limit=1, max_queue=4)
+        await controller.aacquire()
+        order, tasks = await _queue(controller, [("cancelled", 0, "a"), ("next", 0, "b")])
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.wait_for(tasks[1], 1)
+        return order, controller.waiting, controller.active
+
+    assert asyncio.run(run()) == (["next"], 0, 1)
+
+def test_slot_releases_on_error():
+    controller = AdmissionController(limit=1, max_queue=4)
+    with pytest.raises(ValueError):
+        with controller.slot():
+            raise ValueError
+    assert controller.active == 0
+
+def test_deadline_rejections_under_contention_raise_overloaded():
+    controller = AdmissionController(limit=1, max_queue=1000)
+    controller._hold_seconds = 0.0
+    controller.acquire()
+    errors = []
+
+    def call(index):
+        try:
+            controller.acquire(priority=index % 3, session=f"s{index}",
+                               deadline=time.monotonic() + 0.001 * (index % 20))
+            controller.release()
+        except Overloaded:
+            pass
+        except Exception as e:
+            errors.append(e)
+
+    # Switch threads as often as possible so queue changes interleave with rejections
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(200)]
+        for thread in threads:
+            thread.start()
+        for _ in range(200):
+            controller.retry_after(2)
+        for thread in threads:
+            thread.join(5)
+    finally:
+        sys.setswitchinterval(interval)
+    controller.release()
+    assert errors == [] and controller.waiting == 0
@@ -0,0 +1,65 @@
+from concurrent.futures import Future
+from scheduler import Overloaded
+import config
+import workflow
+import pytest
+
+IDEA = "I want to build a mobile app for booking dog walkers"
+
+class FakeAgent:
+    """Agent stand-in that raises the given errors on its first calls, then replies"""
+
+    def __init__(self, name, failures=()):
+        self.name = name
+        self.system_message = ""
+        self.failures = list(failures)
+
+    def generate_reply(self, messages):
+        if self.failures:
+            raise self.failures.pop(0)
+        return f"{self.name} reply"
+
+class RejectedOnWait(Future):
+    """Research started before the turn that is not admitted while the turn waits for it"""
+
+    def result(self, timeout=None):
+        if not self.done():
+            self.set_exception(Overloaded("busy", 3.0))
+        return super().result(timeout)
+
+@pytest.fixture
+def gathering(monkeypatch):
+    """Workflow one answer away from its PRD (turn cap of 1), with agents failing as told"""
+    monkeypatch.setitem(config.SESSION_CONFIG, "enabled", False)
+    monkeypatch.setitem(config.RESEARCH_CONFIG, "web_search", False)
+    monkeypatch.setitem(config.SPECULATION_CONFIG, "enabled", False)
+    monkeypatch.setitem(config.GATHERING_CONFIG, "max_turns", 1)
+    monkeypatch.setattr(workflow, "save_conversation", lambda *args: None)
+
+    def make(**failures):
+        flow = workflow.PRDWorkflow()
+        flow.agents = {name: FakeAgent(name, failures.get(name, ()))
+                       for name in ("conversation_agent", "research_agent", "prd_agent")}
+        flow._add_message("user", IDEA)
+        flow.stage = "requirements_gathering"
+        return flow
+
+    return make
+
+def test_retry_after_rejected_research_runs_it_again(gathering):
+    flow = gathering()
+    flow._research_future = RejectedOnWait()
+
+    rejected = flow.process_input("Busy parents in cities")
+    assert rejected["stage"] == "error" and rejected["retry_after"] == 3.0
+    assert flow.stage == "requirements_gathering" and len(flow.conversation_history) == 1
+    assert flow._research_future is None  # the rollback does not bring back the rejected research
+
+    retried = flow.process_input("Busy parents in cities")
+    assert retried["stage"] == "complete"
+    assert [m["content"] for m in flow.conversation_history].count("Busy parents in cities") == 1
+
+def test_failed_research_is_restarted(gathering):
+    flow = gathering(research_agent=[ConnectionError("down")])
+    assert flow.process_input("Busy parents in cities")["stage"] == "error"
+    assert flow.process_input("That's all")["stage"] == "complete"
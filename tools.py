@@ -1,33 +1,38 @@
-from duckduckgo_search import DDGS
+from session_store import get_store
+from research import search
 
 def web_search(query: str, max_results: int = 3) -> str:
-    """Simple web search using DuckDuckGo"""
+    """Simple web search (cached, through the shared research backend)"""
     try:
-        ddgs = DDGS()
-        results = list(ddgs.text(query, max_results=max_results))
+        results = search(query, max_results=max_results)
         
         if not results:
             return f"No results found for: {query}"
         
         formatted = [f"Search results for '{query}':\n"]
         for i, result in enumerate(results, 1):
-            title = result.get('title', 'No title')
-            snippet = result.get('body', 'No description')
+            title = result.get('title') or 'No title'
+            snippet = result.get('body') or 'No description'
             formatted.append(f"{i}. {title}\n   {snippet}\n")
         
         return "\n".join(formatted)
     except Exception as e:
         return f"Search failed: {str(e)}"
 
-def save_conversation(session_id: str, conversation: str):
-    """Save conversation to file"""
-    with open(f"conversation_{session_id}.txt", "w") as f:
-        f.write(conversation)
+def save_conversation(session_id: str, conversation):
+    """Save a conversation snapshot (dict of state or plain text) to the session store"""
+    store = get_store()
+    if store is None:
+        return
+    if isinstance(conversation, dict):
+        store.update(session_id, **conversation)
+    else:
+        store.update(session_id, transcript=str(conversation))
 
 def load_conversation(session_id: str) -> str:
-    """Load conversation from file"""
-    try:
-        with open(f"conversation_{session_id}.txt", "r") as f:
-            return f.read()
-    except:
-        return ""
\ No newline at end of file
+    """Load a saved conversation as "role: content" lines"""
+    store = get_store()
+    session = store.load(session_id) if store else None
+    if session is None:
+        return ""
+    return "\n".join(f"{m['role']}: {m['content']}" for m in session["messages"])
@@ -5,13 +5,11 @@ Run with: streamlit run ui.py
 """
 
 import streamlit as st
-from agents import (
-    create_orchestrator_agent, 
-    create_intent_classifier, 
-    create_conversation_agent, 
-    create_research_agent,
-    create_prd_agent
-)
+from cache import get_cache
+from session_store import get_store
+from workflow import PRDWorkflow
+from requirements_state import AREA_LABELS
+from metrics import agent_summary, gathering_summary, render as render_metrics
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -22,23 +20,36 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
-if 'conversation_stage' not in st.session_state:
-    st.session_state.conversation_stage = 'initial'
-if 'current_intent' not in st.session_state:
-    st.session_state.current_intent = None
-if 'agents' not in st.session_state:
-    # Initialize all agents
-    st.session_state.agents = {
-        'orchestrator': create_orchestrator_agent(),
-        'intent_classifier': create_intent_classifier(),
-        'conversation_agent': create_conversation_agent(),
-        'research_agent': create_research_agent(),
-        'prd_agent': create_prd_agent()
-    }
-    logging.info("All agents initialized successfully")
+# Agents are process-wide and built on first use (agents.shared_agents), so only the store is cached here
+@st.cache_resource
+def load_store():
+    return get_store()
+
+store = load_store()
+
+# The workflow is the only per-tab state: restore it from the URL's session ID or start one
+if 'workflow' not in st.session_state:
+    session_id = st.query_params.get("session")
+    workflow = PRDWorkflow.resume(session_id) if (store and session_id) else None
+    st.session_state.workflow = workflow or PRDWorkflow()
+    st.query_params["session"] = st.session_state.workflow.session_id
+
+workflow = st.session_state.workflow
+
+# Shown when the workflow enters a stage mid-turn
+STAGE_BANNERS = {
+    "research": "\n\n✅ **Requirements gathering complete!**\n\n📊 ",
+}
+
+def stream_turn(user_input: str, outcome: dict):
+    """Text of one workflow turn as it streams; the final result is stored in outcome"""
+    for event in workflow.stream_input(user_input):
+        if event["event"] == "token":
+            yield event["content"]
+        elif event["event"] == "stage" and event["stage"] in STAGE_BANNERS:
+            yield STAGE_BANNERS[event["stage"]]
+        elif event["event"] == "result":
+            outcome.update(event["result"])
 
 st.title("🤖 AutoGen PRD Generator")
 st.subheader("AI-Powered Product Requirements Document Creation")
@@ -46,215 +57,89 @@ st.subheader("AI-Powered Product Requirements Document Creation")
 # Sidebar with status
 with st.sidebar:
     st.markdown("### 📊 Session Status")
-    st.write(f"**Stage:** {st.session_state.conversation_stage}")
-    if st.session_state.current_intent:
-        st.write(f"**Intent:** {st.session_state.current_intent}")
-    st.write(f"**Messages:** {len(st.session_state.messages)}")
-    
+    st.write(f"**Stage:** {workflow.stage}")
+    st.write(f"**Messages:** {len(workflow.conversation_history)}")
+    if workflow.stage == 'requirements_gathering':
+        missing = workflow.requirements.missing
+        st.write(f"**Requirements:** {len(AREA_LABELS) - len(missing)}/{len(AREA_LABELS)} areas covered")
+
+    context_stats = workflow.context.stats()
+    st.write(f"**Context:** ~{context_stats['context_tokens']} tokens "
+             f"({context_stats['saved_tokens']} saved, {context_stats['summarized_turns']} turns summarized)")
+
+    response_cache = get_cache()
+    if response_cache is not None:
+        st.write(f"**Cache:** {response_cache.hits} hits / {response_cache.misses} misses")
+
+    if workflow.stage_timings:
+        st.markdown("### ⏱️ Stage Timings")
+        for stage_name, seconds in workflow.stage_timings.items():
+            st.write(f"**{stage_name}:** {seconds:.1f}s")
+
+    with st.expander("📈 Model Metrics"):
+        for agent_name, row in agent_summary().items():
+            st.write(f"**{agent_name}:** {row['calls']} calls, {row['seconds']:.1f}s, "
+                     f"{row['cache_hits']} cached, {row['coalesced']} coalesced, {row['errors']} errors")
+        gathering = gathering_summary()
+        if gathering["prds"]:
+            st.write(f"**Per PRD:** {gathering['turns_per_prd']:.1f} user turns, "
+                     f"{gathering['model_calls_per_prd']:.1f} model calls")
+        st.download_button("Download metrics", render_metrics,
+                           file_name="prd_metrics.prom", mime="text/plain")
+
     st.markdown("---")
     st.markdown("### 🔄 Workflow")
     st.markdown("""
     1. **Intent Detection** - AI analyzes your request
-    2. **Requirements Gathering** - Interactive Q&A session  
+    2. **Requirements Gathering** - Interactive Q&A session
     3. **Market Research** - AI researches relevant data
     4. **PRD Generation** - Creates comprehensive document
     """)
-    
+
     st.markdown("### ⚙️ System")
     st.markdown("- **AutoGen** Multi-Agent Framework")
     st.markdown("- **Ollama** Local LLM")
     st.markdown("- **Qwen2.5VL:3B** Language Model")
-    
+
     if st.button("🔄 Reset Conversation", type="secondary"):
-        st.session_state.messages = []
-        st.session_state.conversation_stage = 'initial'
-        st.session_state.current_intent = None
+        st.session_state.workflow = PRDWorkflow()
+        st.query_params["session"] = st.session_state.workflow.session_id
         st.rerun()
 
 # Main chat interface
 st.markdown("## 💬 Interactive Chat")
 
 # Display conversation history
-for message in st.session_state.messages:
+for message in workflow.conversation_history:
     with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-def process_conversation_turn(user_input: str) -> str:
-    """Process a single conversation turn through the agent workflow"""
-    
-    agents = st.session_state.agents
-    stage = st.session_state.conversation_stage
-    
-    logging.info(f"Processing input at stage: {stage}")
-    
-    try:
-        # Stage 1: Initial intent detection
-        if stage == 'initial':
-            logging.info("Stage: Intent Detection")
-            
-            # Use intent classifier
-            intent_response = agents['intent_classifier'].generate_reply([
-                {"role": "user", "content": user_input}
-            ])
-            
-            # Extract intent from response
-            intent = str(intent_response).strip().lower()
-            st.session_state.current_intent = intent
-            logging.info(f"Detected intent: {intent}")
-            
-            if 'prd' in intent:
-                # Move to conversation stage
-                st.session_state.conversation_stage = 'requirements_gathering'
-                
-                # Start requirements gathering
-                conversation_prompt = f"""The user wants to create a PRD for: "{user_input}"
-
-Start gathering requirements by asking your first question. Remember to ask only ONE specific question to begin understanding their product needs."""
-                
-                conv_response = agents['conversation_agent'].generate_reply([
-                    {"role": "user", "content": conversation_prompt}
-                ])
-                
-                return f"🎯 **Great! I'll help you create a Product Requirements Document.**\n\n{conv_response}"
-            
-            else:
-                return "👋 Hi! I specialize in creating Product Requirements Documents (PRDs). Please describe a product, feature, or system you'd like to document, and I'll help you create a comprehensive PRD through an interactive conversation."
-        
-        # Stage 2: Requirements gathering conversation
-        elif stage == 'requirements_gathering':
-            logging.info("Stage: Requirements Gathering")
-            
-            # Build conversation context
-            conversation_context = "Previous conversation:\n"
-            for msg in st.session_state.messages[-10:]:  # Last 10 messages for context
-                conversation_context += f"{msg['role']}: {msg['content']}\n"
-            
-            conversation_context += f"\nLatest user response: {user_input}"
-            
-            # Get next question or determine if complete
-            conv_response = agents['conversation_agent'].generate_reply([
-                {"role": "user", "content": conversation_context}
-            ])
-            
-            # Check if requirements are complete
-            if "REQUIREMENTS_COMPLETE" in str(conv_response):
-                logging.info("Requirements gathering complete, moving to research phase")
-                st.session_state.conversation_stage = 'research_and_generation'
-                
-                # Extract the main topic for research
-                first_user_message = st.session_state.messages[0]['content']
-                
-                # Perform research
-                research_prompt = f"""Research the market and technical landscape for: {first_user_message}
-
-Based on our conversation, gather relevant information about:
-- Market opportunities and trends
-- Competitive analysis
-- Technical best practices
-- User behavior insights
-
-Use web search to find current information."""
-                
-                with st.spinner("🔍 Researching market data and best practices..."):
-                    research_response = agents['research_agent'].generate_reply([
-                        {"role": "user", "content": research_prompt}
-                    ])
-                
-                # Generate PRD
-                prd_prompt = f"""Create a comprehensive Product Requirements Document based on:
-
-CONVERSATION HISTORY:
-{conversation_context}
-
-RESEARCH FINDINGS:
-{research_response}
-
-Generate a detailed, professional PRD following the structured format."""
-
-                with st.spinner("📝 Generating your comprehensive PRD..."):
-                    prd_response = agents['prd_agent'].generate_reply([
-                        {"role": "user", "content": prd_prompt}
-                    ])
-                
-                st.session_state.conversation_stage = 'complete'
-                
-                return f"""✅ **Requirements gathering complete!**
-
-📊 **Research Summary:**
-{research_response}
-
----
-
-## 📋 **Your Product Requirements Document**
-
-{prd_response}
-
----
-
-🎉 **PRD Generation Complete!** 
-
-You can now:
-- Copy the PRD for your use
-- Ask me to refine specific sections
-- Start a new PRD conversation"""
-            
-            else:
-                return conv_response
-        
-        # Stage 3: PRD complete - handle follow-up
-        elif stage == 'complete':
-            logging.info("Stage: Post-PRD Interaction")
-            
-            if any(word in user_input.lower() for word in ['new', 'another', 'different', 'start over']):
-                # Reset for new conversation
-                st.session_state.conversation_stage = 'initial'
-                st.session_state.current_intent = None
-                return "🔄 **Starting fresh!** What new product would you like to create a PRD for?"
-            
-            elif any(word in user_input.lower() for word in ['refine', 'improve', 'modify', 'change']):
-                return "🔧 **I can help refine the PRD!** Which specific section would you like me to improve or what changes would you like to make?"
-            
-            else:
-                return """🤔 **I can help you with:**
-
-- **Refine the PRD** - Improve specific sections or add details
-- **Start a new PRD** - Create documentation for a different product  
-- **Answer questions** - About the PRD or product requirements process
-
-What would you like to do?"""
-        
-        else:
-            # Fallback
-            st.session_state.conversation_stage = 'initial'
-            return "🔄 Let's start fresh. What product would you like to create a PRD for?"
-    
-    except Exception as e:
-        logging.error(f"Error in conversation processing: {e}")
-        return f"⚠️ I encountered an issue: {str(e)}. Please try rephrasing your request or check that Ollama is running properly."
+        st.markdown(str(message["content"]))
 
 # Handle user input
 if user_input := st.chat_input("Describe your product idea or ask a question..."):
-    # Add user message to history
-    st.session_state.messages.append({"role": "user", "content": user_input})
-    
     # Display user message
     with st.chat_message("user"):
         st.markdown(user_input)
-    
+
     # Generate and display AI response
     with st.chat_message("assistant"):
-        with st.spinner("🤖 Processing your request..."):
-            try:
-                response = process_conversation_turn(user_input)
-                st.markdown(response)
-                # Add AI response to history
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                
-            except Exception as e:
-                error_message = f"❌ **Error occurred:** {str(e)}\n\n**Troubleshooting:**\n- Ensure Ollama is running (`ollama serve`)\n- Check if the model is available (`ollama list`)\n- Verify the model name in config.py"
-                st.error(error_message)
-                logging.error(f"Error in conversation: {e}")
+        outcome = {}
+        st.write_stream(stream_turn(user_input, outcome))
+
+        if outcome.get("retry_after") is not None:
+            st.warning(f"⏳ **The model servers are busy.** Please try again in about {outcome['retry_after']:.0f}s.")
+        elif outcome.get("stage") == "error":
+            st.error(f"❌ **Error occurred:** {outcome['response']}\n\n**Troubleshooting:**\n"
+                     "- Ensure Ollama is running (`ollama serve`)\n"
+                     "- Check if the model is available (`ollama list`)\n"
+                     "- Verify the model name in config.py")
+        elif outcome.get("action") == "prd_generated":
+            st.success("🎉 **PRD Generation Complete!** Ask me to refine a section, or start a new PRD.")
+        elif outcome.get("action") == "section_refined":
+            st.success("✅ **Section updated.** The rest of the PRD is unchanged.")
+
+    # "new" starts a fresh session inside the workflow; keep the URL pointing at it
+    st.query_params["session"] = workflow.session_id
 
 # Footer
 st.markdown("---")
-st.markdown("**🚀 Built with AutoGen + Ollama + Streamlit | Local & Private AI Processing**")
\ No newline at end of file
+st.markdown("**🚀 Built with AutoGen + Ollama + Streamlit | Local & Private AI Processing**")
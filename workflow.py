@@ -1,81 +1,320 @@
-from agents import (
-    create_orchestrator_agent,
-    create_intent_classifier, 
-    create_conversation_agent,
-    create_research_agent,
-    create_prd_agent
-)
+from agents import shared_agents
 from tools import save_conversation
+from session_store import get_store
+from llm import stream_reply, session_scope
+from scheduler import Overloaded
+from intent import pre_classify
+from context import ConversationContext
+from research import gather_research
+from sections import (parse_sections, requirements_digest, section_prompt, summary_prompt, clean_section,
+                      assemble, split_prd, replace_section, find_section, refine_prompt)
+from config import PRD_CONFIG, SPECULATION_CONFIG, GATHERING_CONFIG
+from requirements_state import RequirementsState, AREA_LABELS, adds_information
+from metrics import registry
+from executors import DaemonThreadPool
+from typing import Iterator
+import copy
 import logging
+import re
+import time
 import uuid
 
 logging.basicConfig(level=logging.INFO)
 
+# Shared pools; daemon threads, so work left behind by an abandoned turn never blocks exit
+
+# Research that runs while requirements are still being gathered
+_research_executor = DaemonThreadPool(max_workers=4, thread_name_prefix="research")
+
+# Speculative drafts made while the user is typing
+_speculation_executor = DaemonThreadPool(max_workers=2, thread_name_prefix="speculation")
+
+# Concurrent model calls such as sectioned PRD drafting
+_parallel_executor = DaemonThreadPool(max_workers=PRD_CONFIG["max_parallel_sections"],
+                                      thread_name_prefix="parallel")
+
+# Sections that carry the areas without a PRD section of their own (purpose, business context)
+SUMMARY_SECTIONS = ("Executive Summary", "Product Overview")
+
+# Words that ask for a change to the finished PRD, matched whole ("credit" is not "edit")
+REFINE_WORDS = re.compile(r"\b(refine|improve|modify|change|update|rewrite|expand|revise|edit)\b", re.IGNORECASE)
+
+# Words that ask for a new PRD after the finished one
+NEW_WORDS = re.compile(r"\b(new|another|different)\b", re.IGNORECASE)
+
+def _failed(handle) -> bool:
+    """Whether a background future or asyncio task finished without a result"""
+    return handle.done() and (handle.cancelled() or handle.exception() is not None)
+
+class ModelCall:
+    """Request from workflow logic to its driver for one agent reply"""
+    
+    def __init__(self, agent: str, messages: list, stream: bool):
+        self.agent = agent
+        self.messages = messages
+        self.stream = stream
+
+class Wait:
+    """Request from workflow logic to its driver to wait for a background result"""
+    
+    def __init__(self, handle):
+        self.handle = handle
+
+class Parallel:
+    """Request from workflow logic to its driver for several non-streamed replies at once"""
+    
+    def __init__(self, calls: list):
+        self.calls = calls
+
 class PRDWorkflow:
     """Backend workflow orchestrator for PRD generation"""
     
-    def __init__(self):
-        self.session_id = str(uuid.uuid4())
-        self.agents = {
-            'orchestrator': create_orchestrator_agent(),
-            'intent_classifier': create_intent_classifier(),
-            'conversation_agent': create_conversation_agent(),
-            'research_agent': create_research_agent(),
-            'prd_agent': create_prd_agent()
-        }
+    def __init__(self, session_id: str = None):
+        self.session_id = session_id or str(uuid.uuid4())
+        self.store = get_store()
+        # Agents are shared process-wide and built lazily; session state lives here
+        self.agents = shared_agents
         self.conversation_history = []
+        self.context = ConversationContext()
         self.stage = 'initial'
+        self._stream = False
+        self._research_future = None
+        self.prd = None
+        self._refine_request = None
+        self.stage_timings = {}
+        self._stage_clock = None
+        self._speculation = None
+        self._gathering_reason = None
+        self.requirements = RequirementsState()
         
         logging.info(f"PRDWorkflow initialized with session ID: {self.session_id}")
     
+    @classmethod
+    def resume(cls, session_id: str):
+        """Rebuild a workflow from the session store, or None if the session is unknown"""
+        
+        store = get_store()
+        session = store.load(session_id) if store else None
+        if session is None:
+            return None
+        
+        workflow = cls(session_id)
+        for message in session["messages"]:
+            workflow.conversation_history.append(message)
+            workflow.context.add(message["role"], message["content"])
+        workflow.stage = session["stage"]
+        workflow.prd = session["state"].get("prd")
+        if "requirements" in session["state"]:
+            workflow.requirements = RequirementsState.from_dict(session["state"]["requirements"])
+        logging.info(f"Resumed session {session_id} at stage '{workflow.stage}' "
+                     f"with {len(session['messages'])} messages")
+        return workflow
+    
     def process_input(self, user_input: str) -> dict:
         """Process user input through the agent workflow"""
         
-        self.conversation_history.append({"role": "user", "content": user_input})
+        result = {}
+        for event in self._events(user_input, stream=False):
+            if event["event"] == "result":
+                result = event["result"]
+        return result
+    
+    def stream_input(self, user_input: str) -> Iterator[dict]:
+        """Process user input, yielding stage and token events as they arrive.
+        
+        Events are dicts with an "event" key:
+        - {"event": "stage", "stage": ...} when the workflow enters a stage
+        - {"event": "token", "agent": ..., "content": ...} for each model token
+        - {"event": "result", "result": {...}} last, same dict process_input returns
+        """
+        return self._events(user_input, stream=True)
+    
+    def _events(self, user_input: str, stream: bool, one_shot: bool = False) -> Iterator[dict]:
+        """Run one workflow turn as a stream of events, making model calls synchronously"""
+        
+        turn = self._turn(user_input, stream, one_shot)
+        send, error = None, None
+        self._time_stage(self.stage)
+        while True:
+            try:
+                item = turn.throw(error) if error else turn.send(send)
+            except StopIteration:
+                self._time_stage(None)
+                return
+            send, error = None, None
+            
+            try:
+                if isinstance(item, ModelCall):
+                    send = yield from self._call(item)
+                elif isinstance(item, Parallel):
+                    send = _parallel_executor.map(
+                        lambda call: self._generate(call.agent, call.messages), item.calls
+                    )
+                elif isinstance(item, Wait):
+                    send = item.handle.result()
+                else:
+                    if item["event"] == "stage":
+                        self._time_stage(item["stage"])
+                    yield item
+            except Exception as e:
+                error = e
+    
+    def _time_stage(self, stage: str = None) -> None:
+        """Close the running stage timer and start one for stage (None ends the turn)"""
+        now = time.perf_counter()
+        if self._stage_clock is not None:
+            running, started = self._stage_clock
+            if running == stage:
+                return
+            elapsed = now - started
+            self.stage_timings[running] = self.stage_timings.get(running, 0.0) + elapsed
+            registry.observe("prd_stage_seconds", elapsed, stage=running)
+        # 'initial' is only ever the moment before intent detection starts
+        self._stage_clock = (stage, now) if stage not in (None, 'initial') else None
+    
+    def _call(self, call: "ModelCall"):
+        """Perform a model call, streaming tokens as events when requested"""
+        
+        if not call.stream:
+            return self._generate(call.agent, call.messages)
+        
+        chunks = []
+        for token in stream_reply(self.agents[call.agent], call.messages, self.session_id):
+            chunks.append(token)
+            yield {"event": "token", "agent": call.agent, "content": token}
+        return "".join(chunks)
+    
+    def _turn(self, user_input: str, stream: bool, one_shot: bool = False):
+        """Workflow logic for one turn, or for a whole one-shot PRD.
+        
+        Yields events for the caller plus ModelCall/Parallel/Wait requests that the
+        driver (_events here, AsyncPRDWorkflow for asyncio) fulfils and sends back.
+        """
+        
+        self._stream = stream
+        checkpoint = self._checkpoint()
+        self._add_message("user", user_input)
         logging.info(f"Processing input at stage '{self.stage}': {user_input[:100]}...")
         
         try:
-            if self.stage == 'initial':
-                return self._handle_intent_detection(user_input)
+            if one_shot:
+                result = yield from self._handle_one_shot(user_input)
+            
+            elif self.stage == 'initial':
+                result = yield from self._handle_intent_detection(user_input)
             
             elif self.stage == 'requirements_gathering':
-                return self._handle_requirements_gathering(user_input)
+                result = yield from self._handle_requirements_gathering(user_input)
             
             elif self.stage == 'complete':
-                return self._handle_post_completion(user_input)
+                result = yield from self._handle_post_completion(user_input)
             
             else:
-                return {"response": "Workflow error. Restarting...", "stage": "initial"}
+                self._set_stage('initial')
+                result = {"response": "Workflow error. Restarting...", "stage": "initial"}
+                yield from self._emit(result["response"])
                 
         except Exception as e:
             logging.error(f"Workflow error: {e}")
-            return {"response": f"Error: {str(e)}", "stage": "error"}
+            result = {"response": f"Error: {str(e)}", "stage": "error"}
+            if isinstance(e, Overloaded):
+                # Not admitted: undo the turn so that retrying it starts from the same state
+                self._rollback(checkpoint)
+                result["retry_after"] = e.retry_after
+            yield from self._emit(result["response"])
+        
+        yield {"event": "result", "result": result}
+    
+    def _generate(self, agent_name: str, messages: list, session: str = None) -> str:
+        """Non-streamed agent reply, queued for admission under this session"""
+        with session_scope(session or self.session_id):
+            return self.agents[agent_name].generate_reply(messages)
+    
+    def _checkpoint(self) -> dict:
+        """Session state a turn may change before its model calls are admitted"""
+        return {
+            "messages": len(self.conversation_history),
+            "context": copy.deepcopy(self.context),
+            "stage": self.stage,
+            "requirements": RequirementsState.from_dict(self.requirements.to_dict()),
+            "research": self._research_future,
+            "speculation": self._speculation,
+            "refine": self._refine_request,
+        }
+    
+    def _rollback(self, checkpoint: dict) -> None:
+        """Restore a checkpoint, in memory and in the session store"""
+        del self.conversation_history[checkpoint["messages"]:]
+        self.context = checkpoint["context"]
+        self.stage = checkpoint["stage"]
+        self.requirements = checkpoint["requirements"]
+        research = checkpoint["research"]
+        # Research that failed (e.g. was not admitted either) must run again on the retry
+        self._research_future = None if research is not None and _failed(research) else research
+        speculation = checkpoint["speculation"]
+        # A draft the turn discarded (and cancelled) cannot be picked up again
+        discarded = speculation and speculation["prd"] is not None and speculation["prd"].cancelled()
+        self._speculation = None if discarded else speculation
+        self._refine_request = checkpoint["refine"]
+        if self.store:
+            self.store.truncate(self.session_id, checkpoint["messages"])
+            self.store.update(self.session_id, stage=self.stage, requirements=self.requirements.to_dict())
+    
+    def _reply(self, agent_name: str, messages: list, visible: bool = True):
+        """Ask the driver for an agent reply; tokens are streamed when visible"""
+        return (yield ModelCall(agent_name, messages, self._stream and visible))
+    
+    def _start_research(self, topic: str):
+        """Start market research in the background and return a handle to Wait on"""
+        return _research_executor.submit(self._research, topic)
     
-    def _handle_intent_detection(self, user_input: str) -> dict:
+    def _emit(self, text: str):
+        """Emit fixed response text as a token event when streaming"""
+        if self._stream:
+            yield {"event": "token", "agent": "workflow", "content": text}
+    
+    def _handle_intent_detection(self, user_input: str):
         """Handle intent detection phase"""
         
-        # Classify intent
-        intent_response = self.agents['intent_classifier'].generate_reply([
-            {"role": "user", "content": user_input}
-        ])
+        yield {"event": "stage", "stage": "intent_detection"}
         
-        intent = str(intent_response).strip().lower()
-        logging.info(f"Detected intent: {intent}")
+        # Classify intent locally; fall back to the LLM only when unsure
+        intent, confidence = pre_classify(user_input)
+        if intent is None:
+            intent_response = yield from self._reply('intent_classifier', [
+                {"role": "user", "content": user_input}
+            ], visible=False)
+            intent = str(intent_response).strip().lower()
+            logging.info(f"Detected intent: {intent} (LLM fallback, local confidence {confidence:.2f})")
+        else:
+            logging.info(f"Detected intent: {intent} (local, confidence {confidence:.2f})")
         
         if 'prd' in intent:
-            self.stage = 'requirements_gathering'
+            self._set_stage('requirements_gathering')
+            yield {"event": "stage", "stage": "requirements_gathering"}
+            
+            # Research only needs the product idea, so start it now in the background
+            self._research_future = self._start_research(user_input)
+            self.requirements.update(user_input)
+            yield from self._emit("Great! I'll help create a PRD.\n\n")
             
-            # Start requirements conversation
-            conv_prompt = f"""User wants PRD for: "{user_input}"
+            # Only a first message that fills every area skips the questions;
+            # the coverage threshold applies once at least one question is answered
+            if self._gathering_done(threshold=len(AREA_LABELS)):
+                return (yield from self._generate_final_prd())
             
-Begin requirements gathering with your first focused question."""
+            # Start requirements conversation; laid out like every later gathering
+            # prompt so the server can reuse its cached prefix on the next turn
+            conv_prompt = self._build_conversation_context()
+            conv_prompt += f"\nBegin requirements gathering. {self._next_question()}"
             
-            conv_response = self.agents['conversation_agent'].generate_reply([
+            conv_response = yield from self._reply('conversation_agent', [
                 {"role": "user", "content": conv_prompt}
             ])
             
             response = f"Great! I'll help create a PRD.\n\n{conv_response}"
-            self.conversation_history.append({"role": "assistant", "content": response})
+            self._add_message("assistant", response)
+            self._track_requirements(question=conv_response)
             
             return {
                 "response": response,
@@ -85,7 +324,8 @@ Begin requirements gathering with your first focused question."""
         
         else:
             response = "I create Product Requirements Documents. Please describe a product you want to document."
-            self.conversation_history.append({"role": "assistant", "content": response})
+            yield from self._emit(response)
+            self._add_message("assistant", response)
             
             return {
                 "response": response,
@@ -93,70 +333,185 @@ Begin requirements gathering with your first focused question."""
                 "intent": "other"
             }
     
-    def _handle_requirements_gathering(self, user_input: str) -> dict:
+    def _handle_one_shot(self, idea: str):
+        """Whole PRD from one idea: one extraction call instead of a conversation, research running alongside"""
+        
+        self._set_stage('requirements_extraction')
+        yield {"event": "stage", "stage": "requirements_extraction"}
+        self._research_future = self._start_research(idea)
+        self.requirements.update(idea)
+        
+        try:
+            # An idea that already covers every area needs nothing inferred
+            if not self.requirements.complete:
+                extracted = yield from self._reply('requirements_extractor', [
+                    {"role": "user", "content": idea}
+                ], visible=False)
+                added = self.requirements.fill(extracted)
+                logging.info(f"Extraction added {len(added)} requirement areas; "
+                             f"{len(self.requirements.covered)}/8 covered")
+            self._record_gathering("one_shot")
+            result = yield from self._generate_final_prd()
+        except Exception:
+            self._set_stage('initial')
+            raise
+        if result["stage"] != "complete":
+            # No turn handles 'requirements_extraction'; a failed one-shot session starts over
+            self._set_stage('initial')
+        return result
+    
+    def _one_shot_result(self, result: dict, seconds: float) -> dict:
+        """Structured result of a one-shot PRD: the PRD, research, requirements and stage timings"""
+        complete = result.get("stage") == "complete"
+        return {
+            "session_id": self.session_id,
+            "stage": result.get("stage", "error"),
+            "prd": self.prd if complete else None,
+            "research": str(result["research"]) if complete else None,
+            "requirements": self.requirements.to_dict(),
+            "timings": dict(self.stage_timings, total=seconds),
+            "error": None if complete else result.get("response"),
+            "retry_after": result.get("retry_after"),
+        }
+    
+    def _handle_requirements_gathering(self, user_input: str):
         """Handle requirements gathering conversation"""
         
+        speculation, self._speculation = self._speculation, None
+        self.requirements.update(user_input)
+        
+        # Enough areas covered, or out of turns: no need to ask the model whether we are done
+        if self._gathering_done():
+            draft = self._reusable_draft(speculation, user_input)
+            return (yield from self._generate_final_prd(draft))
+        
         # Build context from conversation
         context = self._build_conversation_context()
         context += f"\nLatest user response: {user_input}"
+        context += f"\n{self._next_question()}"
+        prompt_tokens = self.context.record_prompt(context)
+        logging.info(f"Conversation prompt ~{prompt_tokens} tokens ({self.context.stats()['saved_tokens']} saved by summary)")
         
         # Get agent response
-        conv_response = self.agents['conversation_agent'].generate_reply([
+        conv_response = yield from self._reply('conversation_agent', [
             {"role": "user", "content": context}
         ])
         
-        # Check if requirements are complete
+        # The agent may still judge the requirements complete before every area is covered
         if "REQUIREMENTS_COMPLETE" in str(conv_response):
             logging.info("Requirements complete, generating PRD")
-            return self._generate_final_prd()
+            yield from self._emit("\n\n")
+            self._record_gathering("agent")
+            draft = self._reusable_draft(speculation, user_input)
+            return (yield from self._generate_final_prd(draft))
         
         else:
             # Continue conversation
-            self.conversation_history.append({"role": "assistant", "content": conv_response})
+            self._add_message("assistant", conv_response)
+            self._track_requirements(question=conv_response)
+            if speculation and speculation["prd"] is not None and not speculation["prd"].done():
+                # Still drafting: keep it rather than start another; newer answers are patched in
+                self._speculation = speculation
+            else:
+                self._settle_speculation(speculation, "unused")
+                if SPECULATION_CONFIG["enabled"]:
+                    self._speculation = self._speculate()
             
             return {
                 "response": conv_response,
                 "stage": "requirements_gathering",
-                "action": "continue_conversation"
+                "action": "continue_conversation",
+                "requirements": self.requirements.to_dict(),
+                "usage": self.context.stats()
             }
     
-    def _generate_final_prd(self) -> dict:
-        """Generate final PRD with research"""
+    def _gathering_done(self, threshold: int = None) -> bool:
+        """Whether requirements gathering can stop without another question"""
+        reason = self.requirements.completion(threshold or GATHERING_CONFIG["completion_threshold"],
+                                              GATHERING_CONFIG["max_turns"])
+        if reason is None:
+            return False
+        logging.info(f"{len(self.requirements.covered)}/8 requirement areas covered ({reason}), generating PRD")
+        self._record_gathering(reason)
+        return True
+
+    def _record_gathering(self, reason: str) -> None:
+        """Note why requirements gathering finished and persist its final state"""
+        self._gathering_reason = reason
+        self._track_requirements()
+    
+    def _count_gathering(self) -> None:
+        """Count the finished gathering once its PRD is done, so retried PRD attempts are not counted again"""
+        if self._gathering_reason is not None:
+            registry.inc("prd_gathering_completed_total", reason=self._gathering_reason)
+            registry.observe("prd_gathering_turns", self.requirements.turns)
+            self._gathering_reason = None
+
+    def _next_question(self) -> str:
+        """Instruction naming the missing areas to ask about; several at once while coverage is low"""
+        missing = [AREA_LABELS[area] for area in self.requirements.missing]
+        asked = missing[:1]
+        if len(self.requirements.covered) < GATHERING_CONFIG["multi_question_below"]:
+            asked = missing[:max(1, GATHERING_CONFIG["questions_per_turn"])]
+        instruction = f"Areas not covered yet: {', '.join(missing)}."
+        if len(asked) == 1:
+            return f"{instruction} Ask about {asked[0]} next."
+        return (f"{instruction} Ask about {', '.join(asked[:-1])} and {asked[-1]} together, "
+                "one short numbered question each.")
+
+    def _track_requirements(self, question: str = None) -> None:
+        """Note the area the next answer is for and persist the requirements state"""
+        if question is not None:
+            self.requirements.ask(question)
+        if self.store:
+            self.store.update(self.session_id, requirements=self.requirements.to_dict())
+    
+    def _generate_final_prd(self, draft=None):
+        """Generate final PRD with research, or take a speculative draft made from the same requirements"""
         
         try:
-            # Extract main topic for research
-            first_input = self.conversation_history[0]['content']
+            yield {"event": "stage", "stage": "research"}
+            yield from self._emit("Research Summary:\n")
             
-            # Do research
-            logging.info("Performing market research")
-            research_prompt = f"""Research market and technical aspects for: {first_input}
+            if self._research_future is None or _failed(self._research_future):
+                # Not started during intent detection (e.g. a resumed session), or failed last time
+                first_input = self.conversation_history[0]['content']
+                self._research_future = self._start_research(first_input)
             
-Find current information about market trends, competitors, and technical best practices."""
-            
-            research_response = self.agents['research_agent'].generate_reply([
-                {"role": "user", "content": research_prompt}
-            ])
+            # Started during intent detection; usually finished by now
+            logging.info("Waiting for background market research")
+            try:
+                research_response = yield Wait(self._research_future)
+            except Exception:
+                self._research_future = None  # run it again on the next attempt
+                raise
+            yield from self._emit(str(research_response))
             
             # Generate PRD
             logging.info("Generating comprehensive PRD")
-            conversation_summary = self._build_conversation_context()
-            
-            prd_prompt = f"""Create comprehensive PRD based on:
-
-CONVERSATION HISTORY:
-{conversation_summary}
-
-RESEARCH FINDINGS:
-{research_response}
-
-Generate detailed, professional PRD with all required sections."""
+            yield {"event": "stage", "stage": "prd_generation"}
+            # The PRD works from the filled requirement slots, not the whole conversation
+            requirements = self.requirements.render()
             
-            prd_response = self.agents['prd_agent'].generate_reply([
-                {"role": "user", "content": prd_prompt}
-            ])
+            yield from self._emit("\n\n---\n\n# Product Requirements Document\n\n")
+            prd_response = (yield from self._take_draft(draft)) if draft is not None else None
+            if prd_response is not None:
+                yield from self._emit(str(prd_response))
+            elif PRD_CONFIG["mode"] == "sectioned":
+                prd_response = yield from self._generate_sectioned_prd(requirements, research_response)
+            else:
+                prd_prompt = self._prd_prompt(requirements, research_response)
+                self.context.record_prompt(prd_prompt)
+                
+                prd_response = yield from self._reply('prd_agent', [
+                    {"role": "user", "content": prd_prompt}
+                ])
             
             # Update stage and save
-            self.stage = 'complete'
+            self.prd = str(prd_response)
+            self._set_stage('complete')
+            self._count_gathering()
+            yield {"event": "stage", "stage": "complete"}
             final_response = f"""Research Summary:
 {research_response}
 
@@ -166,13 +521,12 @@ Generate detailed, professional PRD with all required sections."""
 
 {prd_response}"""
             
-            self.conversation_history.append({"role": "assistant", "content": final_response})
+            self._add_message("assistant", final_response)
             
             # Save conversation
             save_conversation(self.session_id, {
-                "conversation_history": self.conversation_history,
-                "research": research_response,
-                "prd": prd_response
+                "research": str(research_response),
+                "prd": str(prd_response)
             })
             
             return {
@@ -180,34 +534,199 @@ Generate detailed, professional PRD with all required sections."""
                 "stage": "complete",
                 "action": "prd_generated",
                 "prd": prd_response,
-                "research": research_response
+                "research": research_response,
+                "usage": self.context.stats()
             }
             
+        except Overloaded:
+            raise  # _turn undoes the turn so it can be retried
         except Exception as e:
             logging.error(f"PRD generation failed: {e}")
+            yield from self._emit(f"PRD generation failed: {str(e)}")
             return {
                 "response": f"PRD generation failed: {str(e)}",
                 "stage": "error",
                 "action": "generation_failed"
             }
     
-    def _handle_post_completion(self, user_input: str) -> dict:
+    def _prd_prompt(self, requirements: str, research) -> str:
+        """Single-shot PRD prompt for the prd_agent; fixed text first, then research, then requirements"""
+        return f"""Generate a detailed, professional PRD with all required sections, based on the research findings and requirements below.
+
+RESEARCH FINDINGS:
+{research}
+
+REQUIREMENTS:
+{requirements}"""
+    
+    def _speculate(self) -> dict:
+        """Start background work the next answer will probably need.
+        
+        When nearly all requirement areas are covered, drafts the PRD from
+        the requirements as they stand.
+        Research needs no speculation: it already starts at intent detection.
+        """
+        covered = self.requirements.covered
+        speculation = {"covered": covered, "prd": None}
+        if len(covered) >= SPECULATION_CONFIG["min_coverage"] and PRD_CONFIG["mode"] == "single":
+            logging.info(f"{len(covered)}/8 requirement areas covered; drafting PRD speculatively")
+            speculation["prd"] = self._start_speculative_prd(self.requirements.render())
+            registry.inc("prd_speculation_started_total", task="prd")
+        return speculation
+    
+    def _start_speculative_prd(self, requirements: str):
+        """Draft the PRD in the background; returns a handle to Wait on"""
+        return _speculation_executor.submit(self._speculative_prd, requirements, self._research_future)
+    
+    def _speculative_prd(self, requirements: str, research_future) -> str:
+        started = time.perf_counter()
+        research = research_future.result() if research_future is not None else ""
+        prd = self._generate('prd_agent', [
+            {"role": "user", "content": self._prd_prompt(requirements, research)}
+        ], f"{self.session_id}:speculation")
+        registry.observe("prd_speculation_seconds", time.perf_counter() - started, task="prd")
+        return prd
+    
+    def _reusable_draft(self, speculation, answer: str):
+        """The speculative PRD draft if the completing answer leaves it usable, else None.
+        
+        The draft is kept and only the sections the answer affects are
+        rewritten: an area's own section (metrics, timeline, ...), or the
+        summary and overview for purpose and business context.
+        """
+        if not speculation or speculation["prd"] is None:
+            return None
+        if not adds_information(answer, speculation["covered"], SPECULATION_CONFIG["max_reuse_words"]):
+            return {"prd": speculation["prd"], "patch": [], "answer": answer}
+        
+        template = parse_sections(self.agents['prd_agent'].system_message)
+        patch = []
+        for area in sorted(self.requirements.covered - speculation["covered"]):
+            section = find_section(template, AREA_LABELS[area])
+            sections = [section] if section else [find_section(template, title) for title in SUMMARY_SECTIONS]
+            if None in sections:
+                self._settle_speculation(speculation, "miss")
+                return None
+            patch.extend(s for s in sections if s not in patch)
+        return {"prd": speculation["prd"], "patch": patch, "answer": answer}
+    
+    def _take_draft(self, draft: dict):
+        """Wait for a speculative PRD draft and rewrite the sections it is missing; None if unusable"""
+        try:
+            prd = yield Wait(draft["prd"])
+        except Exception as e:
+            registry.inc("prd_speculation_total", task="prd", outcome="error")
+            logging.warning(f"Speculative PRD draft failed ({e}); generating normally")
+            return None
+        if not draft["patch"]:
+            registry.inc("prd_speculation_total", task="prd", outcome="hit")
+            logging.info("Using speculative PRD draft")
+            return prd
+        
+        _, parts = split_prd(prd, self.agents['prd_agent'].system_message)
+        current = {section.number: text for section, text in parts}
+        if any(section.number not in current for section in draft["patch"]):
+            registry.inc("prd_speculation_total", task="prd", outcome="miss")
+            return None
+        
+        outline = [section.heading for section, _ in parts]
+        request = f"Take this new requirement into account: {draft['answer']}"
+        logging.info(f"Using speculative PRD draft, rewriting {len(draft['patch'])} section(s)")
+        replies = yield Parallel([
+            ModelCall('prd_agent', [{"role": "user", "content": refine_prompt(
+                section, current[section.number], outline, request)}], False)
+            for section in draft["patch"]
+        ])
+        for section, reply in zip(draft["patch"], replies):
+            prd = replace_section(prd, section.number, clean_section(section, reply))
+        registry.inc("prd_speculation_total", task="prd", outcome="patched")
+        return prd
+    
+    def _settle_speculation(self, speculation, outcome: str) -> None:
+        """Cancel and count a speculative draft that will not be used"""
+        if speculation and speculation["prd"] is not None:
+            # An asyncio draft stops at once; a threaded one only if it has not started yet
+            speculation["prd"].cancel()
+            registry.inc("prd_speculation_total", task="prd", outcome=outcome)
+    
+    def _generate_sectioned_prd(self, requirements: str, research):
+        """Draft PRD sections concurrently from one digest, then merge them in order"""
+        
+        sections = parse_sections(self.agents['prd_agent'].system_message)
+        digest = requirements_digest(requirements, research)
+        summary = sections[0] if sections and "Summary" in sections[0].title else None
+        body = [section for section in sections if section is not summary]
+        
+        logging.info(f"Drafting {len(body)} PRD sections concurrently")
+        replies = yield Parallel([
+            ModelCall('prd_agent', [{"role": "user", "content": section_prompt(section, digest)}], False)
+            for section in body
+        ])
+        drafts = {section.number: reply for section, reply in zip(body, replies)}
+        
+        if summary is not None:
+            # Written last so it agrees with the sections it summarizes
+            cleaned = [clean_section(section, drafts[section.number]) for section in body]
+            drafts[summary.number] = yield from self._reply('prd_agent', [
+                {"role": "user", "content": summary_prompt(summary, digest, cleaned)}
+            ], visible=False)
+        
+        self.context.record_prompt(digest)
+        prd = assemble(sections, drafts)
+        yield from self._emit(prd)
+        return prd
+    
+    def _research_prompt(self, topic: str, findings: str = "") -> str:
+        """Build the research agent prompt for a product idea and any web findings"""
+        prompt = f"""Research market and technical aspects of the product below. Find current information about market trends, competitors, and technical best practices.
+
+PRODUCT: {topic}"""
+        if findings:
+            prompt += f"""
+
+WEB SEARCH RESULTS:
+{findings}"""
+        return prompt
+    
+    def _research(self, topic: str):
+        """Run web search and market research for a product idea (background task)"""
+        logging.info("Performing market research")
+        findings = gather_research(topic)
+        return self._generate('research_agent', [
+            {"role": "user", "content": self._research_prompt(topic, findings)}
+        ])
+    
+    def _handle_post_completion(self, user_input: str):
         """Handle interactions after PRD completion"""
         
-        user_lower = user_input.lower()
+        wants_refinement = self._refine_request is not None or REFINE_WORDS.search(user_input) is not None
+        target = self._find_target_section(user_input) if wants_refinement and self.prd else None
         
-        if any(word in user_lower for word in ['new', 'another', 'different']):
-            # Reset for new PRD
+        if target is not None:
+            request = f"{self._refine_request} {user_input}" if self._refine_request else user_input
+            self._refine_request = None
+            return (yield from self._refine_section(target, request))
+        
+        if NEW_WORDS.search(user_input):
+            # Reset for new PRD under a new session ID; the finished one stays in the store
             self.__init__()
-            return {
+            if self.store:
+                self.store.update(self.session_id, stage=self.stage)
+            result = {
                 "response": "Starting new PRD session. What product would you like to document?",
                 "stage": "initial",
-                "action": "new_session"
+                "action": "new_session",
+                "session_id": self.session_id
             }
         
-        elif any(word in user_lower for word in ['refine', 'improve', 'modify']):
+        elif wants_refinement:
+            # Remember the request and ask which section it is about
+            self._refine_request = user_input if self._refine_request is None else self._refine_request
+            headings = [section.heading.lstrip("# ") for section, _ in split_prd(self.prd or "")[1]]
             response = "What specific section of the PRD would you like me to refine?"
-            return {
+            if headings:
+                response += "\n\n" + "\n".join(f"- {heading}" for heading in headings)
+            result = {
                 "response": response,
                 "stage": "complete",
                 "action": "refine_request"
@@ -221,36 +740,103 @@ Generate detailed, professional PRD with all required sections."""
 
 What would you like to do?"""
             
-            return {
+            result = {
                 "response": response,
                 "stage": "complete", 
                 "action": "show_options"
             }
+        
+        yield from self._emit(result["response"])
+        return result
+    
+    def _find_target_section(self, request: str):
+        """The section of the stored PRD a refinement request is about, or None"""
+        _, parts = split_prd(self.prd, self.agents['prd_agent'].system_message)
+        return find_section([section for section, _ in parts], request)
+    
+    def _refine_section(self, section, request: str):
+        """Regenerate one PRD section and splice it back into the stored document"""
+        
+        yield {"event": "stage", "stage": "refinement"}
+        _, parts = split_prd(self.prd)
+        current = next(text for part, text in parts if part.number == section.number)
+        outline = [part.heading for part, _ in parts]
+        
+        # Only the target section and the headings travel, not the history or the full PRD
+        prompt = refine_prompt(section, current, outline, request)
+        self.context.record_prompt(prompt)
+        logging.info(f"Refining PRD section '{section.heading}'")
+        reply = yield from self._reply('prd_agent', [
+            {"role": "user", "content": prompt}
+        ])
+        
+        revised = clean_section(section, reply)
+        self.prd = replace_section(self.prd, section.number, revised)
+        self._add_message("assistant", revised)
+        save_conversation(self.session_id, {"prd": self.prd})
+        
+        return {
+            "response": revised,
+            "stage": "complete",
+            "action": "section_refined",
+            "section": section.heading,
+            "prd": self.prd,
+            "usage": self.context.stats()
+        }
+    
+    def _add_message(self, role: str, content) -> None:
+        """Record a message in the history and the bounded prompt context"""
+        self.conversation_history.append({"role": role, "content": content})
+        self.context.add(role, content)
+        if self.store:
+            self.store.append(self.session_id, role, content)
+    
+    def _set_stage(self, stage: str) -> None:
+        """Move to a new stage and persist it"""
+        self.stage = stage
+        if self.store:
+            self.store.update(self.session_id, stage=stage)
     
     def _build_conversation_context(self) -> str:
         """Build conversation context for agent prompts"""
-        context = "Conversation history:\n"
-        for msg in self.conversation_history:
-            context += f"{msg['role']}: {msg['content']}\n"
-        return context
+        return self.context.render()
 
-# Simple function interface for CLI usage
-def generate_prd(user_input: str) -> str:
-    """Generate PRD from single input (for CLI/testing)"""
+def _relay(events: Iterator[dict]):
+    """Forward non-result events and return the final result"""
+    result = {}
+    for event in events:
+        if event["event"] == "result":
+            result = event["result"]
+        else:
+            yield event
+    return result
+
+def _generate_prd_events(user_input: str, stream: bool):
+    """Single-input PRD flow shared by generate_prd and stream_prd"""
     
     workflow = PRDWorkflow()
+    started = time.perf_counter()
+    result = yield from _relay(workflow._events(user_input, stream, one_shot=True))
+    return workflow._one_shot_result(result, time.perf_counter() - started)
+
+# Simple function interface for CLI and batch usage
+def generate_prd(user_input: str) -> dict:
+    """Generate a PRD from a single input without asking questions.
     
-    # Process initial input
-    result1 = workflow.process_input(user_input)
+    Returns {"session_id", "stage", "prd", "research", "requirements",
+    "timings", "error", "retry_after"}; stage is "complete", or "error" with the
+    reason in error (and retry_after set if the model servers were saturated).
+    """
     
-    if result1.get('stage') == 'requirements_gathering':
-        # Simulate additional requirements gathering
-        additional_context = f"Please extract all possible requirements from the initial request: {user_input}"
-        result2 = workflow.process_input(additional_context)
-        
-        if 'prd' in result2.get('response', '').lower():
-            return result2['response']
-        else:
-            return "Could not generate PRD from provided information."
+    events = _generate_prd_events(user_input, stream=False)
+    while True:
+        try:
+            next(events)
+        except StopIteration as done:
+            return done.value
+
+def stream_prd(user_input: str) -> Iterator[dict]:
+    """Streaming generate_prd: yields workflow events, then {"event": "result", "result": {...}}"""
     
-    return result1['response']
\ No newline at end of file
+    result = yield from _generate_prd_events(user_input, stream=True)
+    yield {"event": "result", "result": result}
\ No newline at end of file